@@ -0,0 +1,143 @@
+"""Throughput benchmark for a running server.
+
+Fires ``--requests`` uploads of ``--file`` at ``--url`` with ``--concurrency``
+in-flight requests and reports throughput and latency percentiles. Run it
+once per ``WEB_CONCURRENCY`` setting to see how throughput scales:
+
+    WEB_CONCURRENCY=1 uv run python serve.py &
+    uv run python bench_workers.py --file ../web/public/Sample1.mp3 -c 8 -n 64
+
+To check that interactive uploads stay fast during a backfill, run a batch
+load and an interactive one side by side:
+
+    uv run python bench_workers.py --file ... -c 32 -n 256 --priority batch &
+    uv run python bench_workers.py --file ... -c 2 -n 16 --deadline-ms 20000
+
+``--fake-workers N`` instead starts ``fake_vendors:app`` with N workers at
+``--url``, benchmarks it and stops it again. Vendor calls there are sleeps
+with canned replies, so no API keys or quota are needed.
+
+Only the standard library is used so it can run from any checkout; the
+server started by ``--fake-workers`` needs the app's own dependencies.
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+from pathlib import Path
+from typing import Iterator
+
+
+def _multipart(field: str, path: Path) -> tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = b"".join(
+        [
+            f"--{boundary}\r\n".encode(),
+            f'Content-Disposition: form-data; name="{field}"; filename="{path.name}"\r\n'.encode(),
+            b"Content-Type: application/octet-stream\r\n\r\n",
+            path.read_bytes(),
+            f"\r\n--{boundary}--\r\n".encode(),
+        ]
+    )
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+def _post(url: str, body: bytes, content_type: str) -> tuple[float, int]:
+    request = urllib.request.Request(
+        url, data=body, method="POST", headers={"Content-Type": content_type}
+    )
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=600) as response:
+            response.read()
+            status = response.status
+    except urllib.error.HTTPError as exc:
+        status = exc.code
+    return time.perf_counter() - started, status
+
+
+@contextmanager
+def _fake_server(url: str, workers: int) -> Iterator[None]:
+    parts = urllib.parse.urlsplit(url)
+    server = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "fake_vendors:app",
+            "--host", parts.hostname or "127.0.0.1",
+            "--port", str(parts.port or 80),
+            "--workers", str(workers),
+            "--log-level", "warning",
+        ],
+        cwd=Path(__file__).resolve().parent,
+        env={**os.environ, "WEB_CONCURRENCY": str(workers)},
+    )
+    try:
+        health = urllib.parse.urlunsplit((parts.scheme, parts.netloc, "/health", "", ""))
+        deadline = time.monotonic() + 60
+        while True:
+            if server.poll() is not None:
+                raise SystemExit(f"fake server exited with {server.returncode}")
+            try:
+                with urllib.request.urlopen(health, timeout=1):
+                    break
+            except OSError:
+                if time.monotonic() > deadline:
+                    raise SystemExit("fake server did not come up within 60s")
+                time.sleep(0.2)
+        yield
+    finally:
+        server.terminate()
+        server.wait(timeout=90)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://127.0.0.1:8000/audio/update")
+    parser.add_argument("--file", required=True, type=Path)
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("-n", "--requests", type=int, default=64)
+    parser.add_argument("--priority", choices=("interactive", "batch"), default="interactive")
+    parser.add_argument("--deadline-ms", type=int)
+    parser.add_argument(
+        "--fake-workers",
+        type=int,
+        metavar="N",
+        help="serve fake_vendors:app with N workers at --url for the run",
+    )
+    args = parser.parse_args()
+
+    params = {"priority": args.priority}
+    if args.deadline_ms is not None:
+        params["deadline_ms"] = args.deadline_ms
+    url = f"{args.url}?{urllib.parse.urlencode(params)}"
+    body, content_type = _multipart("audio", args.file)
+    with _fake_server(args.url, args.fake_workers) if args.fake_workers else nullcontext():
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            results = list(
+                pool.map(lambda _: _post(url, body, content_type), range(args.requests))
+            )
+        elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for latency, _ in results)
+    failures = sum(1 for _, status in results if status >= 400)
+    shed = sum(1 for _, status in results if status == 503)
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(f"requests      {len(results)} ({failures} failed, {shed} shed or unavailable)")
+    print(f"concurrency   {args.concurrency}")
+    print(f"throughput    {len(results) / elapsed:.2f} req/s")
+    print(f"latency p50   {quantiles[49]:.3f}s")
+    print(f"latency p95   {quantiles[94]:.3f}s")
+    print(f"latency p99   {quantiles[98]:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
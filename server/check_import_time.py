@@ -0,0 +1,72 @@
+"""Measures ``import main`` in a fresh interpreter and fails over budget.
+
+Also fails if any vendor SDK is imported eagerly, since those are meant to
+load on first use or during warm-up. Used by CI:
+
+    uv run python check_import_time.py --budget-ms 1000
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+SERVER_DIR = Path(__file__).resolve().parent
+DEFERRED_MODULES = ("openai", "sarvamai", "backboard")
+
+
+def measure_import_ms() -> tuple[float, list[str]]:
+    probe = (
+        "import sys; import main; "
+        f"print(','.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", probe],
+        cwd=SERVER_DIR,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    cumulative_us = None
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | imported package"
+        if not line.startswith("import time:"):
+            continue
+        parts = [part.strip() for part in line[len("import time:") :].split("|")]
+        if len(parts) == 3 and parts[2] == "main":
+            cumulative_us = int(parts[1])
+    if cumulative_us is None:
+        raise RuntimeError("import main did not appear in -X importtime output")
+
+    eager = [name for name in result.stdout.strip().split(",") if name]
+    return cumulative_us / 1000, eager
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--budget-ms",
+        type=float,
+        default=float(os.getenv("IMPORT_TIME_BUDGET_MS", "1000")),
+    )
+    args = parser.parse_args()
+
+    # The first run also compiles bytecode; measure the warm second run.
+    measure_import_ms()
+    elapsed_ms, eager = measure_import_ms()
+    print(f"import main: {elapsed_ms:.1f} ms (budget {args.budget_ms:.0f} ms)")
+
+    failed = False
+    if eager:
+        print(f"vendor SDKs imported eagerly: {', '.join(eager)}")
+        failed = True
+    if elapsed_ms > args.budget_ms:
+        print("import time over budget")
+        failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""The app with stand-in vendor clients, for benchmarking without API keys.
+
+``bench_workers.py --fake-workers N`` serves ``fake_vendors:app``: the real
+``main:app`` with the Sarvam, OpenAI and Backboard clients patched to these
+fakes before it starts. Each call sleeps for a configurable latency and
+returns a canned reply, so everything between the vendor calls (routing,
+span translation, local intent classification, encoding, storage) runs for
+real. STT returns ``transcribe_output.json``. Production code never imports
+this module.
+"""
+
+import asyncio
+import json
+import os
+import re
+import time
+import uuid
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any
+
+from settings import BASE_DIR
+
+FAKE_STT_SECONDS = float(os.getenv("FAKE_STT_SECONDS", "1.0"))
+FAKE_TRANSLATE_SECONDS = float(os.getenv("FAKE_TRANSLATE_SECONDS", "0.02"))
+FAKE_INSIGHTS_SECONDS = float(os.getenv("FAKE_INSIGHTS_SECONDS", "1.0"))
+FAKE_BACKBOARD_SECONDS = float(os.getenv("FAKE_BACKBOARD_SECONDS", "0.5"))
+FAKE_STT_OUTPUT = os.getenv("FAKE_STT_OUTPUT", str(BASE_DIR / "transcribe_output.json"))
+
+FAKE_INSIGHTS = {
+    "insights": {
+        "summary": "Customer agrees to pay on the 5th.",
+        "primary_intent": "promise_to_pay",
+        "secondary_intents": [],
+        "risk_level": "low",
+        "entities": [{"type": "date", "value": "5th"}],
+        "obligations": [{"text": "Pay the EMI", "due_date": "5th of next month"}],
+        "review": {"needs_human_review": False},
+    },
+    "ui_spec": {"root": {"type": "InsightsLayout", "props": {}, "children": []}},
+}
+
+
+class _SttJob:
+    def upload_files(self, file_paths: list[str]) -> None:
+        pass
+
+    def start(self) -> None:
+        pass
+
+    def wait_until_complete(self) -> None:
+        time.sleep(FAKE_STT_SECONDS)
+
+    def is_failed(self) -> bool:
+        return False
+
+    def download_outputs(self, output_dir: str) -> None:
+        output = json.loads(Path(FAKE_STT_OUTPUT).read_text(encoding="utf-8"))
+        output["request_id"] = f"fake_{uuid.uuid4().hex}"
+        Path(output_dir, "output.json").write_text(json.dumps(output, ensure_ascii=False))
+
+
+class FakeSarvam:
+    def __init__(self) -> None:
+        self.speech_to_text_job = SimpleNamespace(create_job=lambda **_: _SttJob())
+        self.text = SimpleNamespace(translate=self._translate)
+
+    @staticmethod
+    def _translate(*, input: str, **_: Any) -> SimpleNamespace:
+        time.sleep(FAKE_TRANSLATE_SECONDS)
+        return SimpleNamespace(translated_text=f"[en] {input}")
+
+
+class FakeOpenAI:
+    def __init__(self) -> None:
+        self.responses = SimpleNamespace(create=self._create)
+        self.models = SimpleNamespace(retrieve=lambda model: SimpleNamespace(id=model))
+
+    def with_options(self, **_: Any) -> "FakeOpenAI":
+        return self
+
+    @staticmethod
+    def _create(**_: Any) -> SimpleNamespace:
+        time.sleep(FAKE_INSIGHTS_SECONDS)
+        return SimpleNamespace(output_text=json.dumps(FAKE_INSIGHTS))
+
+
+class FakeBackboard:
+    async def create_assistant(self, **_: Any) -> SimpleNamespace:
+        return SimpleNamespace(assistant_id="fake-assistant")
+
+    async def create_thread(self, assistant_id: str) -> SimpleNamespace:
+        return SimpleNamespace(thread_id=uuid.uuid4().hex)
+
+    async def add_message(self, *, content: str, **_: Any) -> SimpleNamespace:
+        await asyncio.sleep(FAKE_BACKBOARD_SECONDS)
+        indices = [int(index) for index in re.findall(r"^\[(\d+)\] \(CLASSIFY\)", content, re.M)]
+        reply: Any = [
+            {"index": index, "label": "NO_COMMITMENT", "reason": "fake"} for index in indices
+        ]
+        if not indices:
+            reply = {"label": "NO_COMMITMENT", "reason": "fake"}
+        return SimpleNamespace(content=json.dumps(reply))
+
+
+def install() -> None:
+    """Routes every vendor client lookup to the fakes; call before serving."""
+    # Only the Sarvam backends are faked, so keep the router on them.
+    os.environ["STT_PROVIDERS"] = "sarvam"
+    os.environ["TRANSLATION_PROVIDERS"] = "sarvam"
+    os.environ.setdefault("SARVAM_API_KEY", "fake")
+
+    import insights
+    import main
+    import providers
+    import transcriber
+    import translator
+
+    sarvam = FakeSarvam()
+    openai = FakeOpenAI()
+    transcriber.get_client = lambda: sarvam
+    translator.get_client = lambda: sarvam
+    insights.get_client = lambda: openai
+    providers.get_openai_client = lambda: openai
+    intent_flagger = main.get_intent_flagger()
+    if intent_flagger is not None:
+        backboard = FakeBackboard()
+        intent_flagger.get_client = lambda: backboard
+
+
+install()
+
+from main import app  # noqa: E402
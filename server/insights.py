@@ -1,32 +1,33 @@
 import json
 import os
-from pathlib import Path
-from typing import Any
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any
 
-from dotenv import load_dotenv
-from openai import OpenAI
+from resilience import call_vendor
+from settings import load_env
+from transcript_model import Transcript, as_transcript
 
-BASE_DIR = Path(__file__).resolve().parent
-load_dotenv(BASE_DIR / ".env")
+if TYPE_CHECKING:
+    from openai import OpenAI
 
+load_env()
 
-def _build_segments(payload: dict[str, Any]) -> list[dict[str, Any]]:
-    diarized = payload.get("diarized_transcript") or {}
-    entries = diarized.get("entries") or []
-    segments: list[dict[str, Any]] = []
-    for entry in entries:
-        segments.append(
-            {
-                "speaker": entry.get("speaker_id"),
-                "start_s": entry.get("start_time_seconds"),
-                "end_s": entry.get("end_time_seconds"),
-                "text": entry.get("transcript_english") or entry.get("transcript") or "",
-            }
-        )
-    return segments
+INSIGHTS_TIMEOUT_SECONDS = float(os.getenv("INSIGHTS_TIMEOUT_SECONDS", "120"))
+
+
+def _build_segments(transcript: Transcript) -> list[dict[str, Any]]:
+    return [
+        {
+            "speaker": entry.speaker_id,
+            "start_s": entry.start_time_seconds,
+            "end_s": entry.end_time_seconds,
+            "text": entry.transcript_english or entry.transcript or "",
+        }
+        for entry in transcript.entries or []
+    ]
 
 
-def _response_text(response: Any) -> str:
+def response_text(response: Any) -> str:
     if hasattr(response, "output_text") and response.output_text:
         return response.output_text
     try:
@@ -35,32 +36,19 @@ def _response_text(response: Any) -> str:
         raise RuntimeError("OpenAI response did not include text output") from exc
 
 
-def generate_insights(payload: dict[str, Any]) -> dict[str, Any]:
+@lru_cache(maxsize=1)
+def get_client() -> "OpenAI":
+    from openai import OpenAI
+
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise RuntimeError("OPENAI_API_KEY is not set")
+    return OpenAI(api_key=api_key)
 
-    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
-    client = OpenAI(api_key=api_key)
-
-    transcript = payload.get("transcript_english") or payload.get("transcript") or ""
-    segments = _build_segments(payload)
-    language = payload.get("language_code") or payload.get("language") or "unknown"
-    timestamps = payload.get("timestamps") or {}
 
-    input_payload = {
-        "language": language,
-        "transcript": transcript,
-        "segments": segments,
-        "timestamps": {
-            "words": timestamps.get("words"),
-            "words_english": timestamps.get("words_english"),
-            "start_time_seconds": timestamps.get("start_time_seconds"),
-            "end_time_seconds": timestamps.get("end_time_seconds"),
-        },
-    }
-
-    schema = {
+@lru_cache(maxsize=1)
+def insights_schema() -> dict[str, Any]:
+    return {
         "type": "object",
         "additionalProperties": False,
         "properties": {
@@ -499,6 +487,62 @@ def generate_insights(payload: dict[str, Any]) -> dict[str, Any]:
         },
     }
 
+
+def _create_response(
+    client: "OpenAI",
+    model: str,
+    request_input: list[dict[str, Any]],
+    json_schema_format: dict[str, Any],
+) -> Any:
+    try:
+        return client.responses.create(
+            model=model,
+            input=request_input,
+            text={"format": json_schema_format},
+            temperature=0.2,
+        )
+    except TypeError as exc:
+        # Compatibility path for older SDK versions that still use response_format.
+        if "text" not in str(exc):
+            raise
+        return client.responses.create(
+            model=model,
+            input=request_input,
+            response_format={
+                "type": "json_schema",
+                "json_schema": json_schema_format,
+            },
+            temperature=0.2,
+        )
+
+
+def generate_insights(payload: Transcript | dict[str, Any]) -> dict[str, Any]:
+    model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # Same connection pool; the SDK enforces the timeout per attempt.
+    client = get_client().with_options(timeout=INSIGHTS_TIMEOUT_SECONDS)
+
+    call = as_transcript(payload)
+    transcript = call.transcript_english or call.transcript or ""
+    segments = _build_segments(call)
+    language = call.language_code or call.extra.get("language") or "unknown"
+    timestamps = call.timestamps
+
+    input_payload = {
+        "language": language,
+        "transcript": transcript,
+        "segments": segments,
+        "timestamps": {
+            "words": timestamps.words if timestamps else None,
+            "words_english": timestamps.words_english if timestamps else None,
+            "start_time_seconds": (
+                list(timestamps.start_time_seconds) if timestamps else None
+            ),
+            "end_time_seconds": (
+                list(timestamps.end_time_seconds) if timestamps else None
+            ),
+        },
+    }
+
     system_prompt = (
         "You are an audio intelligence analyst for Challenge 1: Universal Financial Audio "
         "Intelligence Engine. Use ONLY the provided transcript, timestamps, and diarized segments. "
@@ -530,29 +574,18 @@ def generate_insights(payload: dict[str, Any]) -> dict[str, Any]:
     json_schema_format = {
         "type": "json_schema",
         "name": "insights",
-        "schema": schema,
+        "schema": insights_schema(),
         "strict": True,
     }
 
-    try:
-        response = client.responses.create(
-            model=model,
-            input=request_input,
-            text={"format": json_schema_format},
-            temperature=0.2,
-        )
-    except TypeError as exc:
-        # Compatibility path for older SDK versions that still use response_format.
-        if "text" not in str(exc):
-            raise
-        response = client.responses.create(
-            model=model,
-            input=request_input,
-            response_format={
-                "type": "json_schema",
-                "json_schema": json_schema_format,
-            },
-            temperature=0.2,
-        )
-
-    return json.loads(_response_text(response))
+    response = call_vendor(
+        "openai",
+        "openai.insights",
+        _create_response,
+        client,
+        model,
+        request_input,
+        json_schema_format,
+        timeout=INSIGHTS_TIMEOUT_SECONDS,
+    )
+    return json.loads(response_text(response))
@@ -1,28 +1,47 @@
 import asyncio
 import json
 import os
+from functools import lru_cache
 
-import dotenv
-from backboard import BackboardClient
+from local_intent import INTENT_LABELS, load_default_classifier, local_threshold
+from resilience import call_vendor_async, get_breaker
+from settings import load_env
+from transcript_model import Transcript
 
 # Load environment variables
-dotenv.load_dotenv()
+load_env()
 
-# Initialize the Backboard client
-client = BackboardClient(api_key=os.getenv("BACKBOARD_API_KEY"))
 
-
-async def classify_intent(utterance, assistant_id):
+@lru_cache(maxsize=1)
+def get_client():
     """
-    Classifies the intent of an utterance using Backboard's stateful assistant.
-    Returns a dictionary containing the classification label and reasoning.
+    Returns the Backboard client, importing the SDK on first use.
     """
-    if not utterance or utterance.strip() == "<nospeech>":
-        return {"label": "NO_COMMITMENT", "reason": "No speech detected"}
+    from backboard import BackboardClient
 
-    prompt = f"""
-    You are classifying customer intent in a financial call.
+    return BackboardClient(api_key=os.getenv("BACKBOARD_API_KEY"))
+
+
+# Local rules + naive Bayes stage; only low-confidence utterances reach the LLM
+get_local_classifier = lru_cache(maxsize=1)(load_default_classifier)
 
+# Reuse one assistant per process; set INTENT_ASSISTANT_ID to share one across workers
+_assistant_id = os.getenv("INTENT_ASSISTANT_ID")
+_assistant_lock = asyncio.Lock()
+
+# Escalated utterances are sent to the LLM in batches of up to this many entries
+BATCH_SIZE = max(1, int(os.getenv("INTENT_BATCH_SIZE", "12")))
+# Neighbouring entries included (unlabelled) on each side of each escalated entry
+BATCH_CONTEXT = max(0, int(os.getenv("INTENT_BATCH_CONTEXT", "2")))
+# Upper bound on lines (classified plus context) in one batch prompt
+# (defaults to room for a full batch of targets with all their context)
+BATCH_MAX_LINES = max(
+    1, int(os.getenv("INTENT_BATCH_MAX_LINES", str(BATCH_SIZE * (2 * BATCH_CONTEXT + 1))))
+)
+# How many times indices missing from a batch reply are re-queued
+BATCH_RETRIES = max(0, int(os.getenv("INTENT_BATCH_RETRIES", "1")))
+
+LABEL_RUBRIC = """
     Choose EXACTLY ONE label from:
     AGREEMENT,
     CONDITIONAL_AGREEMENT,
@@ -39,7 +58,92 @@ async def classify_intent(utterance, assistant_id):
     - If customer disputes loan or payment → DISPUTE
     - If asking questions → INFORMATION_SEEKING
     - If vague or evasive → NO_COMMITMENT
+"""
+
+
+def _strip_code_fence(content):
+    # Extract JSON if wrapped in markdown blocks
+    content = content.strip()
+    if "```" in content:
+        try:
+            if "```json" in content:
+                content = content.split("```json")[1].split("```")[0]
+            else:
+                content = content.split("```")[1].split("```")[0]
+            content = content.strip()
+        except IndexError:
+            pass
+    return content
+
+
+# Per-request deadline for Backboard calls, so one slow reply can't hang a call
+BACKBOARD_TIMEOUT_SECONDS = float(os.getenv("BACKBOARD_TIMEOUT_SECONDS", "60"))
+
+
+async def _ask_once(prompt, assistant_id):
+    # Create a fresh thread for each request to ensure stateless isolation
+    client = get_client()
+    thread = await client.create_thread(assistant_id)
+
+    # Send a message and get the complete response
+    response = await client.add_message(
+        thread_id=thread.thread_id,
+        content=prompt,
+        llm_provider="openai",
+        model_name="gpt-4o",
+        stream=False,
+    )
+    return _strip_code_fence(response.content)
+
+
+async def _ask(prompt, assistant_id):
+    # Classification is idempotent, so slow replies may be hedged
+    return await call_vendor_async(
+        "backboard",
+        "backboard.classify",
+        _ask_once,
+        prompt,
+        assistant_id,
+        hedge=True,
+        timeout=BACKBOARD_TIMEOUT_SECONDS,
+    )
+
+
+async def get_assistant_id():
+    """
+    Returns the intent assistant id, creating the assistant on first use.
+    """
+    global _assistant_id
+    async with _assistant_lock:
+        if _assistant_id is None:
+            print("Initializing Intent Classification Assistant...")
+            assistant = await get_client().create_assistant(
+                name="Financial Intent Classifier",
+                system_prompt="You are a professional financial services assistant specializing in intent classification.",
+            )
+            _assistant_id = assistant.assistant_id
+    return _assistant_id
+
+
+def _report_error(what, e):
+    print(f"Error classifying {what}: {e}")
+    # If it was an API error, we might see it here
+    if hasattr(e, "response") and hasattr(e.response, "text"):
+        print(f"API Response: {e.response.text}")
+
+
+async def classify_intent(utterance, assistant_id):
+    """
+    Classifies the intent of an utterance using Backboard's stateful assistant.
+    Returns a dictionary containing the classification label and reasoning.
+    Raises if the request fails or the reply has no valid label.
+    """
+    if not utterance or utterance.strip() == "<nospeech>":
+        return {"label": "NO_COMMITMENT", "reason": "No speech detected"}
 
+    prompt = f"""
+    You are classifying customer intent in a financial call.
+    {LABEL_RUBRIC}
     Return JSON only. No explanation.
     JSON Format: {{"label": "LABEL", "reason": "Brief explanation"}}
 
@@ -47,39 +151,226 @@ async def classify_intent(utterance, assistant_id):
     "{utterance}"
     """
 
+    data = json.loads(await _ask(prompt, assistant_id))
+    label = str(data.get("label", "")).strip().upper() if isinstance(data, dict) else ""
+    if label not in INTENT_LABELS:
+        raise ValueError(f"reply has no valid label: {data!r:.100}")
+    return {"label": label, "reason": data.get("reason", "")}
+
+
+def _parse_batch_reply(content, wanted):
+    """
+    Parses a batch reply into {index: {"label", "reason"}}, keeping only
+    requested indices with a valid label. Anything else is treated as missing.
+    """
     try:
-        # Create a fresh thread for each classification to ensure stateless isolation
-        thread = await client.create_thread(assistant_id)
-
-        # Send a message and get the complete response
-        response = await client.add_message(
-            thread_id=thread.thread_id,
-            content=prompt,
-            llm_provider="openai",
-            model_name="gpt-4o",
-            stream=False,
+        data = json.loads(content)
+    except json.JSONDecodeError:
+        # Models sometimes wrap the array in prose; take the outermost brackets
+        start, end = content.find("["), content.rfind("]")
+        if start == -1 or end <= start:
+            return {}
+        try:
+            data = json.loads(content[start : end + 1])
+        except json.JSONDecodeError:
+            return {}
+
+    if isinstance(data, dict):
+        data = data.get("results") or data.get("labels") or []
+    if not isinstance(data, list):
+        return {}
+
+    parsed = {}
+    for item in data:
+        if not isinstance(item, dict):
+            continue
+        try:
+            index = int(item.get("index"))
+        except (TypeError, ValueError):
+            continue
+        label = str(item.get("label", "")).strip().upper()
+        if index in wanted and label in INTENT_LABELS:
+            parsed[index] = {"label": label, "reason": item.get("reason", "")}
+    return parsed
+
+
+def _context_indices(indices, count):
+    """Indices within BATCH_CONTEXT of any target, in conversation order."""
+    included = set()
+    for index in indices:
+        included.update(
+            range(max(0, index - BATCH_CONTEXT), min(count, index + BATCH_CONTEXT + 1))
         )
+    return sorted(included)
 
-        content = response.content.strip()
 
-        # Extract JSON if wrapped in markdown blocks
-        if "```" in content:
+def _batch_windows(indices, count):
+    """
+    Groups escalated indices into batches of up to BATCH_SIZE targets and
+    BATCH_MAX_LINES prompt lines. Targets far apart still share a batch: the
+    prompt only carries each target's own context (see _context_indices).
+    """
+    windows = []
+    window = []
+    for index in sorted(indices):
+        if window and (
+            len(window) >= BATCH_SIZE
+            or len(_context_indices(window + [index], count)) > BATCH_MAX_LINES
+        ):
+            windows.append(window)
+            window = []
+        window.append(index)
+    if window:
+        windows.append(window)
+    return windows
+
+
+async def classify_intent_batch(entries, indices, assistant_id):
+    """
+    Classifies the entries at `indices` in a single LLM request, with
+    neighbouring entries included as unlabelled context.
+    Returns {index: {"label", "reason"}} for every index the reply covered;
+    raises if the request itself fails.
+    """
+    wanted = set(indices)
+    lines = []
+    previous = None
+    for index in _context_indices(indices, len(entries)):
+        if previous is not None and index > previous + 1:
+            lines.append("...")
+        previous = index
+        entry = entries[index]
+        utterance = (entry.utterance or "").replace("\n", " ")
+        marker = "CLASSIFY" if index in wanted else "context"
+        lines.append(
+            f"[{index}] ({marker}) speaker {entry.speaker_id}: {json.dumps(utterance, ensure_ascii=False)}"
+        )
+    conversation = "\n".join(lines)
+
+    prompt = f"""
+    You are classifying customer intent in a financial call.
+    Below are excerpts of the diarized conversation, with "..." where lines were
+    left out. Classify EVERY line marked CLASSIFY; lines marked context are only
+    there to help you understand them.
+    {LABEL_RUBRIC}
+    Return JSON only. No explanation.
+    JSON Format: [{{"index": 0, "label": "LABEL", "reason": "Brief explanation"}}]
+
+    Conversation:
+{conversation}
+    """
+
+    return _parse_batch_reply(await _ask(prompt, assistant_id), wanted)
+
+
+async def classify_escalated(entries, indices, assistant_id):
+    """
+    Classifies escalated entries in batches (see _batch_windows). Indices a
+    parsed reply leaves out are re-queued up to BATCH_RETRIES times, then
+    classified one at a time. Entries whose request failed are not retried.
+    Returns ({index: result}, {index: error}).
+    """
+    results = {}
+    failures = {}
+    pending = list(indices)
+
+    for attempt in range(BATCH_RETRIES + 1):
+        if not pending or BATCH_SIZE == 1:
+            break
+        missing = []
+        for window in _batch_windows(pending, len(entries)):
             try:
-                if "```json" in content:
-                    content = content.split("```json")[1].split("```")[0]
-                else:
-                    content = content.split("```")[1].split("```")[0]
-                content = content.strip()
-            except IndexError:
-                pass
-
-        return json.loads(content)
-    except Exception as e:
-        print(f"Error classifying intent for '{utterance[:30]}...': {e}")
-        # If it was an API error, we might see it here
-        if hasattr(e, "response") and hasattr(e.response, "text"):
-            print(f"API Response: {e.response.text}")
-        return {"label": "NO_COMMITMENT", "reason": f"Classification error: {e}"}
+                parsed = await classify_intent_batch(entries, window, assistant_id)
+            except Exception as e:
+                # The vendor just failed; calling it once per entry won't help
+                _report_error(f"batch {window}", e)
+                failures.update(dict.fromkeys(window, str(e)))
+                continue
+            results.update(parsed)
+            missing.extend(index for index in window if index not in parsed)
+        if missing:
+            print(f"  Batch attempt {attempt + 1}: {len(missing)} entries missing, re-queueing")
+        pending = missing
+
+    for index in pending:
+        try:
+            results[index] = await classify_intent(entries[index].utterance, assistant_id)
+        except Exception as e:
+            _report_error(f"entry {index}", e)
+            failures[index] = str(e)
+
+    return results, failures
+
+
+async def classify_transcript(transcript, indices=None):
+    """
+    Classifies every diarized entry of a Transcript (or only those at `indices`),
+    annotating entries in place.
+    Confident local predictions are kept; the rest are escalated to Backboard.
+    """
+    entries = transcript.entries or []
+    targets = range(len(entries)) if indices is None else sorted(indices)
+    print(f"Found {len(targets)} entries to process.")
+
+    threshold = local_threshold()
+    escalated = []
+    local_results = {}
+
+    for i in targets:
+        entry = entries[i]
+        utterance = entry.utterance
+
+        if not utterance:
+            continue
+
+        local = get_local_classifier().predict(utterance)
+        local_results[i] = {
+            "label": local.label,
+            "reason": local.reason,
+            "confidence": round(local.confidence, 3),
+            "source": "local",
+        }
+        if local.confidence < threshold:
+            escalated.append(i)
+            continue
+
+        # Store result back in the entry (optional but useful)
+        entry.intent_classification = local_results[i]
+        print(f"({i + 1}/{len(entries)}) {utterance[:50]}... -> {local.label} (local)")
+
+    if escalated and get_breaker("backboard").is_open:
+        # Fail fast: keep the low-confidence local labels rather than wait on a
+        # vendor that is currently failing
+        print("Backboard circuit open; keeping local labels for escalated entries.")
+        for i in escalated:
+            entries[i].intent_classification = {
+                **local_results[i],
+                "degraded": True,
+                "degraded_reason": "backboard circuit open",
+            }
+        escalated = []
+
+    if escalated:
+        # Only create the assistant once something actually needs the LLM
+        try:
+            assistant_id = await get_assistant_id()
+        except Exception as e:
+            _report_error("assistant setup", e)
+            results, failures = {}, dict.fromkeys(escalated, str(e))
+        else:
+            results, failures = await classify_escalated(entries, escalated, assistant_id)
+        for i in escalated:
+            if i in results:
+                result = {**results[i], "source": "llm"}
+            else:
+                # Keep the local label rather than invent one for a failed call
+                result = {**local_results[i], "degraded": True, "degraded_reason": failures[i]}
+            entries[i].intent_classification = result
+            source = "degraded" if result.get("degraded") else "llm"
+            print(f"({i + 1}/{len(entries)}) {entries[i].utterance[:50]}... -> {result['label']} ({source})")
+
+    print(f"Escalated {len(escalated)}/{len(targets)} entries to the LLM.")
+    return transcript
 
 
 async def process_and_log(input_json_path):
@@ -90,50 +381,27 @@ async def process_and_log(input_json_path):
         print(f"Error: Path {input_json_path} does not exist.")
         return
 
-    # 1. Create/Ensure an assistant exists for this task
-    print("Initializing Intent Classification Assistant...")
-    assistant = await client.create_assistant(
-        name="Financial Intent Classifier",
-        system_prompt="You are a professional financial services assistant specializing in intent classification.",
-    )
-
     with open(input_json_path, "r", encoding="utf-8") as f:
         data = json.load(f)
 
     # Extract utterances from diarized transcript if available, or use the top-level list
     # The expected input format from translator.py has diarized_transcript/entries
-    entries = []
     if isinstance(data, list):
-        entries = data
-    elif "diarized_transcript" in data and "entries" in data["diarized_transcript"]:
-        entries = data["diarized_transcript"]["entries"]
-
-    print(f"Found {len(entries)} entries to process.")
-
-    for i, entry in enumerate(entries):
-        utterance = (
-            entry.get("transcript_english")
-            or entry.get("utterance")
-            or entry.get("transcript")
-        )
-
-        if not utterance:
-            continue
-
-        print(f"({i + 1}/{len(entries)}) Classifying: {utterance[:50]}...")
+        transcript = Transcript.from_entries(data)
+    else:
+        transcript = Transcript.from_dict(data)
 
-        result = await classify_intent(utterance, assistant.assistant_id)
+    await classify_transcript(transcript)
 
-        # Store result back in the entry (optional but useful)
-        entry["intent_classification"] = result
-
-        label = result.get("label", "UNKNOWN")
-        print(f"  -> Result: {label}")
+    if isinstance(data, list):
+        output = [entry.to_dict(include_intents=True) for entry in transcript.entries]
+    else:
+        output = transcript.to_dict(include_intents=True)
 
     # Save results to a new flagged file
     output_path = input_json_path.replace(".json", "_flagged.json")
     with open(output_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2)
+        json.dump(output, f, indent=2)
 
     print(f"\nProcessing complete! Results saved to: {output_path}")
 
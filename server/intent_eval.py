@@ -0,0 +1,137 @@
+"""Offline evaluation of the local intent classifier against LLM labels.
+
+Reads ``*_flagged.json`` files produced by ``intent-flagger.py`` (or any JSON
+with ``diarized_transcript.entries[].intent_classification``), replays the
+local classifier on each utterance and reports how often it agrees with the
+LLM label and what fraction of LLM calls it would avoid.
+
+    python intent_eval.py output/*_flagged.json --threshold 0.85 \\
+        --write-calibration intent_calibration.json
+"""
+
+import argparse
+import json
+from collections import Counter
+from pathlib import Path
+from typing import Any
+
+from local_intent import (
+    DEFAULT_THRESHOLD,
+    Calibration,
+    LocalIntentClassifier,
+    load_default_classifier,
+)
+from transcript_model import Transcript
+
+
+def load_labelled(paths: list[str]) -> list[tuple[str, str]]:
+    labelled: list[tuple[str, str]] = []
+    for path in paths:
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if isinstance(data, list):
+            transcript = Transcript.from_entries(data)
+        else:
+            transcript = Transcript.from_dict(data)
+
+        for entry in transcript.entries or []:
+            result = entry.intent_classification or {}
+            # Entries already decided locally carry no LLM ground truth.
+            if result.get("source", "llm") != "llm":
+                continue
+            # Nor do failed LLM calls (older outputs stored a placeholder label).
+            if result.get("degraded") or str(result.get("reason", "")).startswith(
+                "Classification error"
+            ):
+                continue
+            if not entry.utterance or not result.get("label"):
+                continue
+            labelled.append((entry.utterance, result["label"]))
+    return labelled
+
+
+def fit_calibration(
+    scored: list[tuple[float, bool]], bins: int
+) -> Calibration:
+    edges = [index / bins for index in range(1, bins)]
+    hits = [0] * bins
+    totals = [0] * bins
+    for raw, agreed in scored:
+        index = min(int(raw * bins), bins - 1)
+        totals[index] += 1
+        hits[index] += int(agreed)
+
+    # Laplace smoothing keeps empty bins from claiming perfect precision.
+    precision = [(hits[i] + 1) / (totals[i] + 2) for i in range(bins)]
+    # Enforce monotonicity so a higher raw score never lowers confidence.
+    for i in range(1, bins):
+        precision[i] = max(precision[i], precision[i - 1])
+    return Calibration(edges, precision)
+
+
+def evaluate(
+    classifier: LocalIntentClassifier,
+    labelled: list[tuple[str, str]],
+    threshold: float,
+) -> dict[str, Any]:
+    accepted = 0
+    accepted_agree = 0
+    overall_agree = 0
+    confusion: Counter[tuple[str, str]] = Counter()
+    scored: list[tuple[float, bool]] = []
+
+    for utterance, llm_label in labelled:
+        raw = classifier.raw_predict(utterance)
+        prediction = classifier.predict(utterance)
+        agreed = prediction.label == llm_label
+        scored.append((raw.confidence, raw.label == llm_label))
+        overall_agree += int(agreed)
+        if prediction.confidence >= threshold:
+            accepted += 1
+            accepted_agree += int(agreed)
+            confusion[(llm_label, prediction.label)] += 1
+
+    total = len(labelled)
+    return {
+        "utterances": total,
+        "threshold": threshold,
+        "llm_calls_avoided": accepted,
+        "fraction_avoided": accepted / total if total else 0.0,
+        "agreement_when_local": accepted_agree / accepted if accepted else None,
+        "agreement_overall": overall_agree / total if total else None,
+        "confusion_when_local": {
+            f"{llm}->{local}": count for (llm, local), count in confusion.most_common()
+        },
+        "_scored": scored,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("paths", nargs="+", help="flagged JSON files with LLM labels")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--bins", type=int, default=10)
+    parser.add_argument(
+        "--write-calibration",
+        help="fit histogram-binning calibration on raw scores and write it here",
+    )
+    args = parser.parse_args()
+
+    labelled = load_labelled(args.paths)
+    classifier = load_default_classifier()
+    report = evaluate(classifier, labelled, args.threshold)
+    scored = report.pop("_scored")
+
+    if args.write_calibration:
+        calibration = fit_calibration(scored, args.bins)
+        Path(args.write_calibration).write_text(
+            json.dumps(calibration.to_dict(), indent=2), encoding="utf-8"
+        )
+        classifier.calibration = calibration
+        report["calibrated"] = evaluate(classifier, labelled, args.threshold)
+        report["calibrated"].pop("_scored")
+
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
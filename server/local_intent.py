@@ -0,0 +1,239 @@
+import json
+import math
+import os
+import re
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable
+
+INTENT_LABELS: tuple[str, ...] = (
+    "AGREEMENT",
+    "CONDITIONAL_AGREEMENT",
+    "DELAY_REQUEST",
+    "REFUSAL",
+    "DISPUTE",
+    "INFORMATION_SEEKING",
+    "NO_COMMITMENT",
+)
+
+DEFAULT_THRESHOLD = 0.85
+
+# Uncalibrated naive Bayes posteriors from a few dozen seed sentences are
+# overconfident; scale them down until a calibration table is supplied.
+UNCALIBRATED_MODEL_DISCOUNT = 0.8
+
+_TOKEN_RE = re.compile(r"[a-z0-9']+")
+_DATE_RE = (
+    r"(\b\d{1,2}(st|nd|rd|th)\b|\bmonday|\btuesday|\bwednesday|\bthursday|\bfriday"
+    r"|\bsaturday|\bsunday|\btomorrow\b|\bsalary\b|\bdate\b)"
+)
+
+# (label, weight, pattern). Weights are the prior precision of each rule and
+# are replaced by the calibration table when one is loaded.
+RULES: tuple[tuple[str, float, re.Pattern[str]], ...] = tuple(
+    (label, weight, re.compile(pattern))
+    for label, weight, pattern in (
+        ("AGREEMENT", 0.92, r"^(ok(ay)?|yes|yeah|yep|sure|fine|alright|all right|done|agreed)[.! ]*$"),
+        ("AGREEMENT", 0.9, r"\b(i|we)('ll| will) (pay|clear|settle)\b(?!.*\b(if|when|after|once|but)\b)(?!.*" + _DATE_RE + ")"),
+        ("CONDITIONAL_AGREEMENT", 0.9, r"\b(pay|clear|settle)\b.*\b(if|when|after|once|as soon as)\b"),
+        ("CONDITIONAL_AGREEMENT", 0.88, r"\b(i|we)('ll| will) (pay|clear|settle)\b.*" + _DATE_RE),
+        ("DELAY_REQUEST", 0.9, r"\b(more time|extension|extend|postpone|next (week|month)|give me (some )?time|few (more )?days)\b"),
+        ("REFUSAL", 0.9, r"\b(can('|no)?t|cannot|won't|will not|unable to|not going to) (pay|afford)\b|\bno money\b"),
+        ("DISPUTE", 0.9, r"\b(not my loan|never took|already paid|wrong (amount|charge)|fraud|did not take|didn't take)\b"),
+        ("INFORMATION_SEEKING", 0.88, r"\?\s*$"),
+        ("INFORMATION_SEEKING", 0.86, r"^(what|when|where|why|how|which|who|can you tell|could you tell)\b"),
+        ("NO_COMMITMENT", 0.9, r"^(hmm+|uh+|um+|ah+|hello|hi)[.!? ]*$"),
+    )
+)
+
+SEED_EXAMPLES: tuple[tuple[str, str], ...] = (
+    ("Okay, I will pay the amount", "AGREEMENT"),
+    ("Yes I agree to pay the EMI", "AGREEMENT"),
+    ("Sure, I will clear the dues today", "AGREEMENT"),
+    ("I will pay it, no problem", "AGREEMENT"),
+    ("I will pay once my salary is credited", "CONDITIONAL_AGREEMENT"),
+    ("If the bounce charges are waived I will pay", "CONDITIONAL_AGREEMENT"),
+    ("I can pay on the 5th when I get money", "CONDITIONAL_AGREEMENT"),
+    ("After I get my salary I will settle it", "CONDITIONAL_AGREEMENT"),
+    ("Please give me some more time", "DELAY_REQUEST"),
+    ("Can I pay next month instead", "DELAY_REQUEST"),
+    ("I need a few more days to arrange the money", "DELAY_REQUEST"),
+    ("Please extend the due date", "DELAY_REQUEST"),
+    ("I cannot pay this month", "REFUSAL"),
+    ("I will not pay anything", "REFUSAL"),
+    ("I have no money to pay", "REFUSAL"),
+    ("I lost my job, I can't afford it", "REFUSAL"),
+    ("This is not my loan", "DISPUTE"),
+    ("I already paid this amount last week", "DISPUTE"),
+    ("The charges are wrong, I never took this", "DISPUTE"),
+    ("Why was I charged a bounce fee", "DISPUTE"),
+    ("What is the outstanding amount", "INFORMATION_SEEKING"),
+    ("When is the due date for the EMI", "INFORMATION_SEEKING"),
+    ("How do I pay online", "INFORMATION_SEEKING"),
+    ("Can you tell me the loan details", "INFORMATION_SEEKING"),
+    ("Let me see", "NO_COMMITMENT"),
+    ("I will think about it", "NO_COMMITMENT"),
+    ("I am busy right now, call later", "NO_COMMITMENT"),
+    ("Hmm, maybe", "NO_COMMITMENT"),
+)
+
+
+def _tokens(text: str) -> list[str]:
+    return _TOKEN_RE.findall(text.lower())
+
+
+@dataclass(slots=True)
+class LocalPrediction:
+    label: str
+    confidence: float
+    source: str
+    reason: str
+
+
+class NaiveBayesIntentModel:
+    """Multinomial naive Bayes over unigrams and bigrams."""
+
+    def __init__(self, alpha: float = 1.0) -> None:
+        self.alpha = alpha
+        self.label_counts: Counter[str] = Counter()
+        self.token_counts: dict[str, Counter[str]] = {
+            label: Counter() for label in INTENT_LABELS
+        }
+        self.vocabulary: set[str] = set()
+
+    @staticmethod
+    def _features(text: str) -> list[str]:
+        tokens = _tokens(text)
+        return tokens + [f"{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+
+    def fit(self, examples: Iterable[tuple[str, str]]) -> "NaiveBayesIntentModel":
+        for text, label in examples:
+            if label not in self.token_counts:
+                continue
+            features = self._features(text)
+            self.label_counts[label] += 1
+            self.token_counts[label].update(features)
+            self.vocabulary.update(features)
+        return self
+
+    def predict_proba(self, text: str) -> dict[str, float]:
+        features = self._features(text)
+        total = sum(self.label_counts.values())
+        if not total:
+            return {}
+
+        vocab_size = len(self.vocabulary) or 1
+        log_scores: dict[str, float] = {}
+        for label in INTENT_LABELS:
+            counts = self.token_counts[label]
+            denominator = sum(counts.values()) + self.alpha * vocab_size
+            score = math.log((self.label_counts[label] + self.alpha) / (total + self.alpha * len(INTENT_LABELS)))
+            for feature in features:
+                if feature in self.vocabulary:
+                    score += math.log((counts[feature] + self.alpha) / denominator)
+            log_scores[label] = score
+
+        peak = max(log_scores.values())
+        exp_scores = {label: math.exp(score - peak) for label, score in log_scores.items()}
+        norm = sum(exp_scores.values())
+        return {label: value / norm for label, value in exp_scores.items()}
+
+
+class Calibration:
+    """Histogram-binning calibration: raw score bin -> observed agreement."""
+
+    def __init__(self, edges: list[float], precision: list[float]) -> None:
+        if len(precision) != len(edges) + 1:
+            raise ValueError("calibration needs len(edges) + 1 precision values")
+        self.edges = edges
+        self.precision = precision
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Calibration":
+        return cls(list(data["edges"]), list(data["precision"]))
+
+    def to_dict(self) -> dict[str, Any]:
+        return {"edges": self.edges, "precision": self.precision}
+
+    def __call__(self, raw: float) -> float:
+        return self.precision[bisect_right(self.edges, raw)]
+
+
+class LocalIntentClassifier:
+    def __init__(
+        self,
+        model: NaiveBayesIntentModel | None = None,
+        calibration: Calibration | None = None,
+    ) -> None:
+        self.model = model or NaiveBayesIntentModel().fit(SEED_EXAMPLES)
+        self.calibration = calibration
+
+    def raw_predict(self, utterance: str) -> LocalPrediction:
+        text = utterance.strip()
+        lowered = text.lower()
+        if not text or lowered == "<nospeech>":
+            return LocalPrediction("NO_COMMITMENT", 1.0, "rule", "No speech detected")
+
+        rule_hits: dict[str, float] = {}
+        for label, weight, pattern in RULES:
+            if pattern.search(lowered):
+                rule_hits[label] = max(weight, rule_hits.get(label, 0.0))
+
+        probabilities = self.model.predict_proba(text)
+        model_label = max(probabilities, key=probabilities.get) if probabilities else None
+        model_score = probabilities.get(model_label, 0.0) if model_label else 0.0
+
+        if len(rule_hits) == 1:
+            label, weight = next(iter(rule_hits.items()))
+            if label == model_label:
+                return LocalPrediction(label, max(weight, model_score), "rule+model", "Rule and model agree")
+            if model_label is not None:
+                # A rule the model disagrees with is not confident enough to
+                # skip the LLM, however strong the rule's own weight.
+                return LocalPrediction(label, 0.5, "rule", "Rule and model disagree")
+            return LocalPrediction(label, weight, "rule", "Matched local rule")
+        if len(rule_hits) > 1:
+            # Conflicting rules are exactly the ambiguous cases the LLM is for.
+            label = max(rule_hits, key=rule_hits.get)
+            return LocalPrediction(label, 0.5, "rule", "Conflicting local rules")
+        if model_label is None:
+            return LocalPrediction("NO_COMMITMENT", 0.0, "model", "No local model")
+        return LocalPrediction(model_label, model_score, "model", "Local model")
+
+    def predict(self, utterance: str) -> LocalPrediction:
+        # raw_predict never discounts, so a calibration fitted on its scores
+        # is applied to the same scale it was fitted on.
+        prediction = self.raw_predict(utterance)
+        if self.calibration is not None:
+            if prediction.confidence < 1.0:
+                prediction.confidence = self.calibration(prediction.confidence)
+        elif prediction.source == "model":
+            prediction.confidence *= UNCALIBRATED_MODEL_DISCOUNT
+        return prediction
+
+
+def load_examples(path: str | Path) -> list[tuple[str, str]]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [(item["text"], item["label"]) for item in data]
+
+
+def load_default_classifier() -> LocalIntentClassifier:
+    examples = list(SEED_EXAMPLES)
+    examples_path = os.getenv("INTENT_LOCAL_EXAMPLES_PATH")
+    if examples_path:
+        examples.extend(load_examples(examples_path))
+
+    calibration = None
+    calibration_path = os.getenv("INTENT_LOCAL_CALIBRATION_PATH")
+    if calibration_path:
+        calibration = Calibration.from_dict(
+            json.loads(Path(calibration_path).read_text(encoding="utf-8"))
+        )
+
+    return LocalIntentClassifier(NaiveBayesIntentModel().fit(examples), calibration)
+
+
+def local_threshold() -> float:
+    return float(os.getenv("INTENT_LOCAL_THRESHOLD", str(DEFAULT_THRESHOLD)))
@@ -1,21 +1,45 @@
-import json
+import asyncio
 import os
 import tempfile
-from importlib.util import module_from_spec, spec_from_file_location
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from importlib.util import find_spec, module_from_spec, spec_from_file_location
 from pathlib import Path
-from typing import Any
+from typing import Any, Literal
 
-from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi import FastAPI, File, HTTPException, Query, Request, UploadFile, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 
+import insights
+import transcriber
+import translator
 from insights import generate_insights
-from transcriber import transcribe_audio_file
-from translator import translate_transcription
+from profiling import authorized as profile_authorized
+from profiling import load_profile, start_profile
+from providers import AllProvidersFailed, NoProviderAvailable, router_stats
+from providers import transcribe as transcribe_audio
+from providers import translate as translate_audio_transcript
+from resilience import CircuitOpenError, VendorTimeoutError, breaker_states
+from reanalysis import EditError, EditRequest, apply_edits, retranslate
+from response_codec import build_compact_response, encode_response
+from scheduler import SchedulerShed, scheduler
+from store import ROLLUP_DEFAULT_DAYS, QueryError, StaleWriteError, get_store
+from streaming import StreamProtocolError, StreamSession
+from transcript_model import Transcript
 
-app = FastAPI(title="Audio Update Service")
 
+@lru_cache(maxsize=1)
+def get_intent_flagger() -> Any | None:
+    # The Backboard SDK is only imported once the flagger needs its client, so
+    # check that it is installed up front rather than failing mid-request.
+    if find_spec("backboard") is None:
+        print("[warn] intent-flagger unavailable: backboard is not installed")
+        return None
 
-def load_intent_flagger_module() -> Any | None:
     script_path = Path(__file__).resolve().with_name("intent-flagger.py")
     spec = spec_from_file_location("intent_flagger", script_path)
     if spec is None or spec.loader is None:
@@ -30,34 +54,83 @@ def load_intent_flagger_module() -> Any | None:
     return module
 
 
-INTENT_FLAGGER = load_intent_flagger_module()
+async def run_intent_flagger(transcript: Transcript) -> bool:
+    intent_flagger = get_intent_flagger()
+    if intent_flagger is None:
+        return False
 
+    await intent_flagger.classify_transcript(transcript)
+    return True
 
-async def run_intent_flagger(translated_output: dict[str, Any]) -> dict[str, Any] | None:
-    if INTENT_FLAGGER is None:
-        return None
 
-    with tempfile.NamedTemporaryFile(
-        mode="w", delete=False, suffix=".json", encoding="utf-8"
-    ) as temp_json:
-        input_path = temp_json.name
-        temp_json.write(json.dumps(translated_output, ensure_ascii=False))
+def _warm_sync_clients() -> None:
+    insights.insights_schema()
+    transcriber.get_client()
+    translator.get_client()
 
-    output_path = input_path.replace(".json", "_flagged.json")
 
-    try:
-        await INTENT_FLAGGER.process_and_log(input_path)
+def _warm_openai() -> None:
+    # A cheap authenticated call opens the pooled HTTPS connection that
+    # responses.create will reuse.
+    client = insights.get_client()
+    client.models.retrieve(os.getenv("OPENAI_MODEL", "gpt-4o-mini"))
 
-        if not os.path.exists(output_path):
-            raise RuntimeError("intent-flagger.py did not produce an output file")
 
-        with open(output_path, "r", encoding="utf-8") as flagged_file:
-            return json.load(flagged_file)
-    finally:
-        if os.path.exists(input_path):
-            os.remove(input_path)
-        if os.path.exists(output_path):
-            os.remove(output_path)
+async def _warm_intent_flagger() -> None:
+    intent_flagger = get_intent_flagger()
+    if intent_flagger is None:
+        raise RuntimeError("intent-flagger unavailable")
+    intent_flagger.get_local_classifier()
+    await intent_flagger.get_assistant_id()
+
+
+async def warm_up() -> dict[str, str]:
+    """Imports vendor SDKs, builds clients and opens connections ahead of traffic."""
+    status: dict[str, str] = {}
+    steps = (
+        ("clients", lambda: run_in_threadpool(_warm_sync_clients)),
+        ("openai", lambda: run_in_threadpool(_warm_openai)),
+        ("intent_flagger", _warm_intent_flagger),
+    )
+    for name, step in steps:
+        try:
+            await step()
+            status[name] = "ok"
+        except Exception as exc:
+            print(f"[warn] warm-up step {name} failed: {exc}")
+            status[name] = f"error: {exc}"
+    return status
+
+
+# None until warm-up has finished; readiness is reported from this.
+WARMUP_STATUS: dict[str, str] | None = None
+
+
+async def _run_warm_up() -> None:
+    global WARMUP_STATUS
+    WARMUP_STATUS = await warm_up()
+    print(f"[worker {os.getpid()}] ready: {WARMUP_STATUS}")
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    global WARMUP_STATUS
+    warm_up_task = None
+    if os.getenv("WARMUP_ON_STARTUP", "1") != "0":
+        # Warm up in the background so the worker answers liveness probes
+        # immediately; /ready flips once this completes.
+        warm_up_task = asyncio.create_task(_run_warm_up())
+    else:
+        WARMUP_STATUS = {}
+    yield
+    # uvicorn stops accepting connections and waits for in-flight requests
+    # (up to --timeout-graceful-shutdown) before running this.
+    if warm_up_task is not None and not warm_up_task.done():
+        warm_up_task.cancel()
+    print(f"[worker {os.getpid()}] drained, shutting down")
+
+
+app = FastAPI(title="Audio Update Service", lifespan=lifespan)
 
 
 app.add_middleware(
@@ -74,45 +147,422 @@ app.add_middleware(
 )
 
 
+def build_payload(
+    transcript: Transcript,
+    insights_payload: dict[str, Any],
+    *,
+    intents_ran: bool,
+    compact: bool,
+    degraded: dict[str, str],
+) -> dict[str, Any]:
+    if compact:
+        payload = build_compact_response(
+            transcript, insights_payload, intents_ran=intents_ran
+        )
+    else:
+        payload = {
+            **transcript.to_dict(),
+            "intent_output": (
+                transcript.to_dict(include_intents=True) if intents_ran else None
+            ),
+            "insights": insights_payload.get("insights"),
+            "ui_spec": insights_payload.get("ui_spec"),
+        }
+    if degraded:
+        print(f"[warn] degraded response: {degraded}")
+        payload["degraded"] = degraded
+    return payload
+
+
+def save_result(
+    transcript: Transcript,
+    insights_payload: dict[str, Any],
+    *,
+    intents_ran: bool,
+    degraded: dict[str, str],
+    expected_updated_at: float | None = None,
+) -> None:
+    """Persists everything needed to re-derive the response or re-analyse it.
+
+    The analysis is already paid for, so a failed write is logged and
+    reported under ``degraded["store"]`` rather than failing the response.
+    Only a ``StaleWriteError`` (see ``expected_updated_at``) is raised.
+    """
+    try:
+        get_store().save(
+            transcript.request_id,
+            {
+                **transcript.to_dict(include_intents=True),
+                "intents_ran": intents_ran,
+                "insights": insights_payload.get("insights"),
+                "ui_spec": insights_payload.get("ui_spec"),
+                "degraded": degraded,
+            },
+            expected_updated_at=expected_updated_at,
+        )
+    except StaleWriteError:
+        raise
+    except Exception as exc:
+        print(f"[error] could not store {transcript.request_id}: {exc!r}")
+        degraded["store"] = str(exc)
+
+
+def load_result(request_id: str) -> tuple[Transcript, dict[str, Any]]:
+    loaded = get_store().load_versioned(request_id)
+    if loaded is None:
+        raise HTTPException(status_code=404, detail=f"unknown request_id {request_id}")
+    document, updated_at = loaded
+    stored = {
+        key: document.pop(key, None)
+        for key in ("intents_ran", "insights", "ui_spec", "degraded")
+    }
+    stored["updated_at"] = updated_at
+    return Transcript.from_dict(document), stored
+
+
 @app.post("/audio/update")
-async def audio_update(audio: UploadFile = File(...)):
+async def audio_update(
+    request: Request,
+    audio: UploadFile = File(...),
+    compact: bool = False,
+    language: str | None = None,
+    priority: Literal["interactive", "batch"] = "interactive",
+    deadline_ms: int | None = Query(default=None, ge=1),
+):
     suffix = Path(audio.filename or "input.bin").suffix
     temp_path: str | None = None
+    profile = start_profile(request)
+    # Vendor-bound stages take a scheduler slot each, so interactive uploads
+    # overtake queued backfill work between stages.
+    ticket = scheduler.admit(priority, deadline_ms)
+    transcript: Transcript | None = None
+    audio_bytes = 0
+    status = 200
 
     try:
-        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
-            temp_path = temp_file.name
-            content = await audio.read()
-            temp_file.write(content)
+        async with profile.stage("upload"):
+            with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+                temp_path = temp_file.name
+                content = await audio.read()
+                temp_file.write(content)
+                audio_bytes = len(content)
 
-        transcribe_output = transcribe_audio_file(temp_path)
-        source_language = transcribe_output.get("language_code")
+        # Vendor SDK calls are blocking; keep them off the event loop so one
+        # worker can serve concurrent uploads.
+        try:
+            async with scheduler.stage(ticket, "stt"):
+                transcribe_output, stt_provider = await profile.run_in_threadpool(
+                    "stt", transcribe_audio, temp_path, language
+                )
+        except (CircuitOpenError, NoProviderAvailable, AllProvidersFailed, SchedulerShed) as exc:
+            # Nothing downstream works without a transcript; fail fast.
+            raise HTTPException(status_code=503, detail=str(exc)) from exc
+        transcript = Transcript.from_dict(transcribe_output)
+        transcript.request_id = transcript.request_id or uuid.uuid4().hex
+        transcript.metrics["providers"] = {"stt": stt_provider}
+        source_language = transcript.language_code
         if not source_language:
             raise HTTPException(
                 status_code=400,
                 detail="language_code missing in transcription output",
             )
 
-        translated_output = translate_transcription(
-            transcribe_output,
-            source_lang=source_language,
+        # Later stages degrade to null with a reason instead of failing the
+        # whole request when their vendor is down or too slow.
+        degraded: dict[str, str] = {}
+        try:
+            async with scheduler.stage(ticket, "translation"):
+                _, translation_provider = await profile.run_in_threadpool(
+                    "translation", translate_audio_transcript, transcript, source_language
+                )
+            transcript.metrics["providers"]["translation"] = translation_provider
+        except (
+            CircuitOpenError,
+            VendorTimeoutError,
+            NoProviderAvailable,
+            AllProvidersFailed,
+            SchedulerShed,
+        ) as exc:
+            degraded["translation"] = str(exc)
+
+        try:
+            async with scheduler.stage(ticket, "intents"), profile.stage("intents"):
+                intents_ran = await run_intent_flagger(transcript)
+        except Exception as exc:
+            intents_ran = False
+            degraded["intent_output"] = str(exc)
+
+        try:
+            async with scheduler.stage(ticket, "insights"):
+                insights_payload = await profile.run_in_threadpool(
+                    "insights", generate_insights, transcript
+                )
+        except Exception as exc:
+            insights_payload = {}
+            degraded["insights"] = str(exc)
+
+        print(f"[providers] {transcript.metrics['providers']}")
+        await profile.run_in_threadpool(
+            "store",
+            save_result,
+            transcript,
+            insights_payload,
+            intents_ran=intents_ran,
+            degraded=degraded,
         )
-        intent_output = await run_intent_flagger(translated_output)
-        insights_payload = generate_insights(translated_output)
-        return {
-            **translated_output,
-            "intent_output": intent_output,
-            "insights": insights_payload.get("insights"),
-            "ui_spec": insights_payload.get("ui_spec"),
-        }
-    except HTTPException:
+        async with profile.stage("encode"):
+            payload = build_payload(
+                transcript,
+                insights_payload,
+                intents_ran=intents_ran,
+                compact=compact,
+                degraded=degraded,
+            )
+            response = encode_response(
+                payload,
+                accept=request.headers.get("accept"),
+                accept_encoding=request.headers.get("accept-encoding"),
+            )
+        if profile.profile_id is not None:
+            response.headers["X-Profile-Id"] = profile.profile_id
+        return response
+    except HTTPException as exc:
+        status = exc.status_code
         raise
     except Exception as exc:
+        status = 500
         raise HTTPException(status_code=500, detail=str(exc)) from exc
     finally:
         await audio.close()
         if temp_path and os.path.exists(temp_path):
             os.remove(temp_path)
+        scheduler.complete(ticket, succeeded=status == 200)
+        if profile.profile_id is not None:
+            # Diffing allocation snapshots and writing the artifact would
+            # stall the event loop for every other request.
+            await run_in_threadpool(
+                profile.finish,
+                request_id=transcript.request_id if transcript is not None else None,
+                status=status,
+                audio_bytes=audio_bytes,
+            )
+
+
+@app.websocket("/audio/stream")
+async def audio_stream(websocket: WebSocket):
+    await websocket.accept()
+    intent_flagger = get_intent_flagger()
+    session = StreamSession(websocket, intent_flagger=intent_flagger)
+    succeeded = False
+    try:
+        try:
+            await session.run()
+        except (StreamProtocolError, ValueError) as exc:
+            # Bad control message; windows already received are still processed.
+            await _end_stream(session, {"type": "error", "detail": str(exc)}, code=1003)
+            return
+
+        transcript = session.finish()
+        if not transcript.entries:
+            await _end_stream(session, {"type": "done", "request_id": None})
+            return
+
+        # Insights read the whole call, so they are generated once it ends.
+        degraded = dict(session.degraded)
+        try:
+            async with scheduler.stage(session.ticket, "insights"):
+                insights_payload = await run_in_threadpool(generate_insights, transcript)
+        except Exception as exc:
+            insights_payload = {}
+            degraded["insights"] = str(exc)
+        await run_in_threadpool(
+            save_result,
+            transcript,
+            insights_payload,
+            intents_ran=intent_flagger is not None,
+            degraded=degraded,
+        )
+        done = {"type": "done", "request_id": transcript.request_id, **transcript.metrics["stream"]}
+        if "store" in degraded:
+            done["degraded"] = {"store": degraded["store"]}
+        await _end_stream(session, done)
+        succeeded = True
+    finally:
+        # A stream lasts as long as the call, which says nothing about queueing.
+        scheduler.complete(session.ticket, succeeded=succeeded, record_latency=False)
+
+
+async def _end_stream(session: StreamSession, event: dict[str, Any], code: int = 1000) -> None:
+    try:
+        await session.send(event)
+        await session.websocket.close(code=code)
+    except Exception:
+        # The client already hung up; a stored call is still readable via /calls.
+        pass
+
+
+@app.get("/calls")
+async def search_calls(
+    q: str | None = None,
+    label: list[str] = Query(default=[]),
+    risk_level: str | None = None,
+    entity_type: str | None = None,
+    entity_value: str | None = None,
+    due_from: str | None = None,
+    due_to: str | None = None,
+    cursor: int | None = None,
+    limit: int = Query(default=50, ge=1, le=500),
+) -> dict[str, Any]:
+    try:
+        calls, next_cursor = await run_in_threadpool(
+            get_store().search,
+            text=q,
+            labels=label,
+            risk_level=risk_level,
+            entity_type=entity_type,
+            entity_value=entity_value,
+            due_from=due_from,
+            due_to=due_to,
+            cursor=cursor,
+            limit=limit,
+        )
+    except QueryError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return {"calls": calls, "next_cursor": next_cursor}
+
+
+@app.get("/rollups")
+async def get_rollups(
+    date_from: str | None = None,
+    date_to: str | None = None,
+) -> dict[str, Any]:
+    today = datetime.now(timezone.utc).date()
+    try:
+        return await run_in_threadpool(
+            get_store().rollups,
+            date_from or (today - timedelta(days=ROLLUP_DEFAULT_DAYS)).isoformat(),
+            date_to or (today + timedelta(days=ROLLUP_DEFAULT_DAYS)).isoformat(),
+        )
+    except QueryError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
+
+@app.get("/profiles/{profile_id}")
+def get_profile(request: Request, profile_id: str) -> dict[str, Any]:
+    artifact = load_profile(profile_id) if profile_authorized(request) else None
+    if artifact is None:
+        raise HTTPException(status_code=404, detail=f"unknown profile {profile_id}")
+    return artifact
+
+
+@app.get("/calls/{request_id}")
+async def get_call(request: Request, request_id: str, compact: bool = False):
+    transcript, stored = await run_in_threadpool(load_result, request_id)
+    payload = build_payload(
+        transcript,
+        stored,
+        intents_ran=bool(stored["intents_ran"]),
+        compact=compact,
+        degraded=stored["degraded"] or {},
+    )
+    return encode_response(
+        payload,
+        accept=request.headers.get("accept"),
+        accept_encoding=request.headers.get("accept-encoding"),
+    )
+
+
+@app.post("/calls/{request_id}/edits")
+async def edit_call(
+    request: Request,
+    request_id: str,
+    edits: EditRequest,
+    compact: bool = False,
+    priority: Literal["interactive", "batch"] = "interactive",
+    deadline_ms: int | None = Query(default=None, ge=1),
+):
+    transcript, stored = await run_in_threadpool(load_result, request_id)
+    try:
+        plan = apply_edits(transcript, edits)
+    except EditError as exc:
+        raise HTTPException(status_code=422, detail=str(exc)) from exc
+
+    degraded: dict[str, str] = dict(stored["degraded"] or {})
+    insights_payload = {"insights": stored["insights"], "ui_spec": stored["ui_spec"]}
+    intents_ran = bool(stored["intents_ran"])
+    translation: dict[str, int] = {}
+
+    if plan.changed:
+        # Re-analysis uses the same vendors as uploads, so it queues for the
+        # same scheduler slots.
+        ticket = scheduler.admit(priority, deadline_ms)
+        succeeded = False
+        try:
+            try:
+                async with scheduler.stage(ticket, "retranslate"):
+                    translation = await run_in_threadpool(
+                        retranslate, transcript, plan, transcript.language_code or "unknown"
+                    )
+            except SchedulerShed as exc:
+                raise HTTPException(status_code=503, detail=str(exc)) from exc
+            except Exception as exc:
+                raise HTTPException(status_code=500, detail=str(exc)) from exc
+
+            intent_flagger = get_intent_flagger()
+            if intents_ran and intent_flagger is not None and plan.reclassify:
+                try:
+                    async with scheduler.stage(ticket, "reclassify"):
+                        await intent_flagger.classify_transcript(transcript, plan.reclassify)
+                    degraded.pop("intent_output", None)
+                except Exception as exc:
+                    degraded["intent_output"] = str(exc)
+
+            if edits.refresh_insights:
+                try:
+                    async with scheduler.stage(ticket, "insights"):
+                        insights_payload = await run_in_threadpool(generate_insights, transcript)
+                    degraded.pop("insights", None)
+                except Exception as exc:
+                    degraded["insights"] = str(exc)
+            succeeded = True
+        finally:
+            scheduler.complete(ticket, succeeded=succeeded)
+
+        try:
+            await run_in_threadpool(
+                save_result,
+                transcript,
+                insights_payload,
+                intents_ran=intents_ran,
+                degraded=degraded,
+                expected_updated_at=stored["updated_at"],
+            )
+        except StaleWriteError as exc:
+            # Another edit was saved while this one ran; the client reloads
+            # the call and reapplies its corrections.
+            raise HTTPException(status_code=409, detail=str(exc)) from exc
+
+    payload = build_payload(
+        transcript,
+        insights_payload,
+        intents_ran=intents_ran,
+        compact=compact,
+        degraded=degraded,
+    )
+    payload["recomputed"] = {
+        "retranslated_words": sorted(plan.retranslate_words),
+        "retranslated_entries": sorted(plan.retranslate_entries),
+        "reclassified_entries": sorted(plan.reclassify) if intents_ran else [],
+        "transcript_english": plan.transcript_english,
+        "insights": plan.changed and edits.refresh_insights,
+        "chars_translated": translation.get("chars_translated", 0),
+        "translation_calls": translation.get("calls", 0),
+    }
+    return encode_response(
+        payload,
+        accept=request.headers.get("accept"),
+        accept_encoding=request.headers.get("accept-encoding"),
+    )
 
 
 @app.get("/health")
@@ -120,6 +570,21 @@ def health() -> dict[str, str]:
     return {"status": "ok"}
 
 
+@app.get("/ready")
+def ready() -> JSONResponse:
+    if WARMUP_STATUS is None:
+        return JSONResponse({"status": "warming"}, status_code=503)
+    return JSONResponse(
+        {
+            "status": "ready",
+            "warmup": WARMUP_STATUS,
+            "breakers": breaker_states(),
+            "providers": router_stats(),
+            "scheduler": scheduler.snapshot(),
+        }
+    )
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,323 @@
+"""Opt-in per-request profiling of /audio/update.
+
+A profiled request records wall and CPU time for each pipeline stage. It
+also runs a sampling profiler over the threads doing the request's work,
+and ``tracemalloc`` for the top allocation sites. The artifact is written
+to ``PROFILE_DIR`` and served by ``GET /profiles/{profile_id}``.
+
+Nothing runs unless ``PROFILING_ENABLED=1``. A request is then profiled
+when it asks for it (``X-Profile: 1`` or ``?profile=1``, plus
+``X-Profile-Token`` if ``PROFILE_TOKEN`` is set), or when picked at random
+at ``PROFILE_SAMPLE_RATE``. At most ``PROFILE_MAX_CONCURRENT`` requests
+per worker are profiled at once.
+
+Stages run in the threadpool are measured exactly in their own thread.
+Vendor calls that ``call_vendor`` moves onto its hedging pool are sampled
+under the stage that made them, but their CPU time is not added to it.
+Async stages share the event loop thread with other requests, so their
+CPU time and samples include whatever else the loop ran meanwhile.
+``tracemalloc`` is process-wide: allocation sites cover everything the
+worker did while the request was in flight.
+"""
+
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import Counter
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Callable, TypeVar
+
+from starlette.concurrency import run_in_threadpool
+
+from settings import BASE_DIR, load_env
+
+load_env()
+
+T = TypeVar("T")
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+# Fraction of requests profiled without asking; keep small in production.
+PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0"))
+PROFILE_TOKEN = os.getenv("PROFILE_TOKEN")
+PROFILE_MAX_CONCURRENT = int(os.getenv("PROFILE_MAX_CONCURRENT", "1"))
+PROFILE_INTERVAL_SECONDS = float(os.getenv("PROFILE_INTERVAL_MS", "5")) / 1000
+PROFILE_TRACEMALLOC = os.getenv("PROFILE_TRACEMALLOC", "1") == "1"
+PROFILE_TRACEMALLOC_FRAMES = int(os.getenv("PROFILE_TRACEMALLOC_FRAMES", "1"))
+PROFILE_TOP = int(os.getenv("PROFILE_TOP", "25"))
+PROFILE_DIR = os.getenv("PROFILE_DIR", str(BASE_DIR / "data" / "profiles"))
+MAX_STACK_DEPTH = 64
+
+_PROFILE_ID = re.compile(r"^[0-9a-f]{32}$")
+
+# Profile and stage of the code running in this context, for bind_stage().
+_current_stage: ContextVar[tuple["RequestProfile", str] | None] = ContextVar(
+    "profile_stage", default=None
+)
+
+
+class NullProfile:
+    """Stand-in used for unprofiled requests; adds no overhead."""
+
+    profile_id: str | None = None
+
+    async def run_in_threadpool(
+        self, stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        return await run_in_threadpool(fn, *args, **kwargs)
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        yield
+
+    def finish(self, **extra: Any) -> None:
+        pass
+
+
+class RequestProfile(NullProfile):
+    def __init__(self, reason: str) -> None:
+        self.profile_id = uuid.uuid4().hex
+        self.reason = reason
+        self.started_at = time.time()
+        self._started = time.perf_counter()
+        self.stages: list[dict[str, Any]] = []
+        # thread id -> stage currently running on it, for the sampler
+        self.threads: dict[int, str] = {}
+        self.samples: Counter[tuple[str, ...]] = Counter()
+        self.sample_count = 0
+        self._snapshot: tracemalloc.Snapshot | None = None
+
+    async def run_in_threadpool(
+        self, stage: str, fn: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        def measured() -> T:
+            thread_id = threading.get_ident()
+            self.threads[thread_id] = stage
+            token = _current_stage.set((self, stage))
+            wall = time.perf_counter()
+            cpu = time.thread_time()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                _current_stage.reset(token)
+                self.threads.pop(thread_id, None)
+                self._record(stage, "worker", time.perf_counter() - wall, time.thread_time() - cpu)
+
+        return await run_in_threadpool(measured)
+
+    @asynccontextmanager
+    async def stage(self, name: str) -> AsyncIterator[None]:
+        thread_id = threading.get_ident()
+        self.threads[thread_id] = name
+        token = _current_stage.set((self, name))
+        wall = time.perf_counter()
+        cpu = time.thread_time()
+        try:
+            yield
+        finally:
+            _current_stage.reset(token)
+            self.threads.pop(thread_id, None)
+            self._record(name, "event_loop", time.perf_counter() - wall, time.thread_time() - cpu)
+
+    def _record(self, name: str, thread: str, wall: float, cpu: float) -> None:
+        self.stages.append(
+            {
+                "name": name,
+                "thread": thread,
+                "wall_seconds": round(wall, 6),
+                "cpu_seconds": round(cpu, 6),
+                # Time spent waiting (vendors, I/O, other coroutines).
+                "wait_seconds": round(max(0.0, wall - cpu), 6),
+            }
+        )
+
+    def finish(self, **extra: Any) -> None:
+        allocations = _stop_tracing(self)
+        total: Counter[str] = Counter()
+        own: Counter[str] = Counter()
+        folded: list[str] = []
+        for stack, count in self.samples.most_common():
+            stage, *frames = stack
+            if frames:
+                own[frames[-1]] += count
+            for frame in set(frames):
+                total[frame] += count
+            folded.append(";".join(stack) + f" {count}")
+
+        artifact = {
+            "profile_id": self.profile_id,
+            "reason": self.reason,
+            "started_at": self.started_at,
+            "wall_seconds": round(time.perf_counter() - self._started, 6),
+            "stages": self.stages,
+            "samples": {
+                "interval_ms": PROFILE_INTERVAL_SECONDS * 1000,
+                "count": self.sample_count,
+                "top_self": [
+                    {"function": frame, "samples": count}
+                    for frame, count in own.most_common(PROFILE_TOP)
+                ],
+                "top_total": [
+                    {"function": frame, "samples": count}
+                    for frame, count in total.most_common(PROFILE_TOP)
+                ],
+                # Collapsed stacks ("stage;outer;...;inner count") for flame graphs.
+                "folded": folded,
+            },
+            "allocations": allocations,
+            **extra,
+        }
+        os.makedirs(PROFILE_DIR, exist_ok=True)
+        path = os.path.join(PROFILE_DIR, f"{self.profile_id}.json")
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump(artifact, handle, indent=2)
+        print(f"[profile] {self.profile_id} ({self.reason}) -> {path}")
+
+
+_active: list[RequestProfile] = []
+_active_lock = threading.Lock()
+_sampler: threading.Thread | None = None
+
+
+def start_profile(request: Any) -> NullProfile:
+    """Returns a RequestProfile if this request should be profiled."""
+    if not PROFILING_ENABLED:
+        return NullProfile()
+
+    requested = (
+        request.headers.get("x-profile") == "1"
+        or request.query_params.get("profile") in ("1", "true")
+    ) and authorized(request)
+    if requested:
+        reason = "requested"
+    elif PROFILE_SAMPLE_RATE > 0 and random.random() < PROFILE_SAMPLE_RATE:
+        reason = "sampled"
+    else:
+        return NullProfile()
+
+    profile = RequestProfile(reason)
+    if not _start_tracing(profile):
+        return NullProfile()
+    return profile
+
+
+def bind_stage(fn: Callable[..., T]) -> Callable[..., T]:
+    """Wraps fn so the sampler sees it under the caller's stage in any thread."""
+    current = _current_stage.get()
+    if current is None:
+        return fn
+    profile, stage = current
+
+    def bound(*args: Any, **kwargs: Any) -> T:
+        thread_id = threading.get_ident()
+        profile.threads[thread_id] = stage
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profile.threads.pop(thread_id, None)
+
+    return bound
+
+
+def authorized(request: Any) -> bool:
+    return not PROFILE_TOKEN or request.headers.get("x-profile-token") == PROFILE_TOKEN
+
+
+def load_profile(profile_id: str) -> dict[str, Any] | None:
+    if not _PROFILE_ID.match(profile_id):
+        return None
+    try:
+        with open(os.path.join(PROFILE_DIR, f"{profile_id}.json"), encoding="utf-8") as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return None
+
+
+def _start_tracing(profile: RequestProfile) -> bool:
+    """Starts tracing for profile unless PROFILE_MAX_CONCURRENT are running."""
+    global _sampler
+    with _active_lock:
+        # Checked and reserved under one lock, so concurrent requests can't
+        # both see a free slot.
+        if len(_active) >= PROFILE_MAX_CONCURRENT:
+            return False
+        _active.append(profile)
+        if PROFILE_TRACEMALLOC:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(PROFILE_TRACEMALLOC_FRAMES)
+            tracemalloc.reset_peak()
+            profile._snapshot = tracemalloc.take_snapshot()
+        if _sampler is None:
+            _sampler = threading.Thread(target=_sample_loop, name="profile-sampler", daemon=True)
+            _sampler.start()
+    return True
+
+
+def _stop_tracing(profile: RequestProfile) -> dict[str, Any] | None:
+    with _active_lock:
+        _active.remove(profile)
+        if profile._snapshot is None:
+            return None
+        snapshot = tracemalloc.take_snapshot()
+        _, peak = tracemalloc.get_traced_memory()
+        if not _active:
+            # Tracing slows every allocation; only keep it on while needed.
+            tracemalloc.stop()
+
+    ignore = [
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, __file__),
+        tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    ]
+    diff = snapshot.filter_traces(ignore).compare_to(
+        profile._snapshot.filter_traces(ignore), "lineno"
+    )
+    profile._snapshot = None
+    return {
+        "peak_bytes": peak,
+        "net_bytes": sum(stat.size_diff for stat in diff),
+        "top": [
+            {
+                "site": f"{stat.traceback[0].filename}:{stat.traceback[0].lineno}",
+                "size_diff_bytes": stat.size_diff,
+                "count_diff": stat.count_diff,
+                "size_bytes": stat.size,
+            }
+            for stat in sorted(diff, key=lambda stat: abs(stat.size_diff), reverse=True)[:PROFILE_TOP]
+        ],
+    }
+
+
+def _frame_name(frame: Any) -> str:
+    # Keyed by where the function starts, so samples at different lines of
+    # one function aggregate.
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _sample_loop() -> None:
+    global _sampler
+    while True:
+        time.sleep(PROFILE_INTERVAL_SECONDS)
+        # Held while sampling so a profile is never read by finish() and
+        # written here at the same time.
+        with _active_lock:
+            if not _active:
+                _sampler = None
+                return
+            frames = sys._current_frames()
+            for profile in _active:
+                for thread_id, stage in list(profile.threads.items()):
+                    frame = frames.get(thread_id)
+                    stack: list[str] = []
+                    while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                        stack.append(_frame_name(frame))
+                        frame = frame.f_back
+                    profile.samples[(stage, *reversed(stack))] += 1
+                    profile.sample_count += 1
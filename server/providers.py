@@ -0,0 +1,454 @@
+"""Pluggable STT and translation backends with latency-aware routing.
+
+Each stage has a list of registered providers. For every request the router
+drops providers that cannot handle the language or duration, or whose vendor
+circuit breaker is open. It ranks the rest by expected latency, using a
+rolling, size-normalised latency and error rate, and tries them in order,
+failing over to the next one on error.
+"""
+
+import json
+import os
+import shutil
+import subprocess
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from insights import get_client as get_openai_client
+from insights import response_text
+from resilience import call_vendor, get_breaker
+from settings import load_env
+from transcriber import transcribe_audio_file
+from transcript_model import Transcript
+from translator import infer_source_language, translate_transcript
+
+load_env()
+
+# Error rate is weighted this heavily against latency when ranking providers.
+ERROR_PENALTY = float(os.getenv("ROUTER_ERROR_PENALTY", "4"))
+# Exponential smoothing factor for the rolling latency and error rate.
+ROUTER_ALPHA = float(os.getenv("ROUTER_ALPHA", "0.2"))
+
+SARVAM_LANGUAGES = frozenset(
+    {
+        "bn-IN",
+        "en-IN",
+        "gu-IN",
+        "hi-IN",
+        "kn-IN",
+        "ml-IN",
+        "mr-IN",
+        "od-IN",
+        "pa-IN",
+        "ta-IN",
+        "te-IN",
+    }
+)
+
+OPENAI_TRANSCRIPTION_MODEL = os.getenv("OPENAI_TRANSCRIPTION_MODEL", "gpt-4o-transcribe")
+OPENAI_TRANSLATION_MODEL = os.getenv("OPENAI_TRANSLATION_MODEL", "gpt-5.2")
+OPENAI_STT_TIMEOUT_SECONDS = float(os.getenv("OPENAI_STT_TIMEOUT_SECONDS", "300"))
+OPENAI_TRANSLATE_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TRANSLATE_TIMEOUT_SECONDS", "120"))
+
+
+@dataclass(slots=True)
+class ProviderStats:
+    """Rolling latency per unit of work (audio second or 1k characters) and error rate."""
+
+    seconds_per_unit: float | None = None
+    error_rate: float = 0.0
+    calls: int = 0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    def record(self, elapsed: float, units: float, ok: bool) -> None:
+        with self.lock:
+            self.calls += 1
+            self.error_rate += ROUTER_ALPHA * ((0.0 if ok else 1.0) - self.error_rate)
+            if ok and units > 0:
+                rate = elapsed / units
+                if self.seconds_per_unit is None:
+                    self.seconds_per_unit = rate
+                else:
+                    self.seconds_per_unit += ROUTER_ALPHA * (rate - self.seconds_per_unit)
+
+
+@dataclass(slots=True)
+class Provider:
+    name: str
+    vendor: str
+    run: Callable[..., Any]
+    # None means any language is accepted.
+    languages: frozenset[str] | None = None
+    max_duration_s: float | None = None
+    # Prior seconds per unit, used until real samples exist.
+    prior_seconds_per_unit: float = 1.0
+    is_configured: Callable[[], bool] = lambda: True
+    stats: ProviderStats = field(default_factory=ProviderStats)
+
+    def supports(self, language: str | None, duration_s: float | None) -> bool:
+        if self.languages is not None and language not in self.languages:
+            return False
+        if self.max_duration_s is not None and duration_s and duration_s > self.max_duration_s:
+            return False
+        return self.is_configured()
+
+    def expected_seconds(self, units: float) -> float:
+        rate = self.stats.seconds_per_unit or self.prior_seconds_per_unit
+        return rate * max(units, 1.0) * (1 + ERROR_PENALTY * self.stats.error_rate)
+
+
+class NoProviderAvailable(RuntimeError):
+    pass
+
+
+class AllProvidersFailed(NoProviderAvailable):
+    """Every routed provider was tried and failed; ``errors`` maps name to exception."""
+
+    def __init__(self, stage: str, errors: dict[str, Exception]) -> None:
+        self.stage = stage
+        self.errors = errors
+        super().__init__(
+            f"all {stage} providers failed: "
+            + "; ".join(f"{name}: {exc}" for name, exc in errors.items())
+        )
+
+
+def route(
+    providers: list[Provider], language: str | None, duration_s: float | None, units: float
+) -> list[Provider]:
+    candidates = [
+        provider
+        for provider in providers
+        if provider.supports(language, duration_s)
+        and get_breaker(provider.vendor).state != "open"
+    ]
+    # sorted() is stable, so configuration order breaks ties.
+    return sorted(candidates, key=lambda provider: provider.expected_seconds(units))
+
+
+def run_with_failover(
+    stage: str,
+    providers: list[Provider],
+    *args: Any,
+    language: str | None,
+    duration_s: float | None,
+    units: float,
+) -> tuple[Any, str]:
+    ranked = route(providers, language, duration_s, units)
+    if not ranked:
+        raise NoProviderAvailable(
+            f"no {stage} provider available for language={language} duration={duration_s}"
+        )
+
+    errors: dict[str, Exception] = {}
+    for provider in ranked:
+        started = time.monotonic()
+        try:
+            result = provider.run(*args)
+        except Exception as exc:
+            provider.stats.record(time.monotonic() - started, units, ok=False)
+            print(f"[warn] {stage} provider {provider.name} failed: {exc}")
+            errors[provider.name] = exc
+            continue
+        provider.stats.record(time.monotonic() - started, units, ok=True)
+        return result, provider.name
+
+    raise AllProvidersFailed(stage, errors)
+
+
+def probe_duration_seconds(audio_path: str) -> float | None:
+    """Reads the duration with ffprobe when installed, else estimates from size."""
+    if shutil.which("ffprobe"):
+        try:
+            output = subprocess.run(
+                [
+                    "ffprobe",
+                    "-v",
+                    "error",
+                    "-show_entries",
+                    "format=duration",
+                    "-of",
+                    "default=noprint_wrappers=1:nokey=1",
+                    audio_path,
+                ],
+                capture_output=True,
+                text=True,
+                timeout=10,
+                check=True,
+            ).stdout.strip()
+            return float(output)
+        except (subprocess.SubprocessError, ValueError):
+            pass
+    try:
+        # Roughly 128 kbit/s, a typical bitrate for compressed call recordings.
+        return os.path.getsize(audio_path) / 16_000
+    except OSError:
+        return None
+
+
+def _openai_configured() -> bool:
+    return bool(os.getenv("OPENAI_API_KEY"))
+
+
+def _sarvam_configured() -> bool:
+    return bool(os.getenv("SARVAM_API_KEY"))
+
+
+def _sarvam_transcribe(audio_path: str, language_hint: str | None) -> dict[str, Any]:
+    return transcribe_audio_file(audio_path, language_code=language_hint or "unknown")
+
+
+def _openai_transcribe(audio_path: str, language_hint: str | None) -> dict[str, Any]:
+    # Same connection pool; the SDK enforces the timeout per attempt.
+    client = get_openai_client().with_options(timeout=OPENAI_STT_TIMEOUT_SECONDS)
+    kwargs: dict[str, Any] = {"model": OPENAI_TRANSCRIPTION_MODEL, "response_format": "json"}
+    if language_hint:
+        # OpenAI takes ISO-639-1 codes ("ta"), not BCP-47 ("ta-IN").
+        kwargs["language"] = language_hint.split("-")[0]
+
+    with open(audio_path, "rb") as audio_file:
+        response = call_vendor(
+            "openai",
+            "openai.stt",
+            client.audio.transcriptions.create,
+            timeout=OPENAI_STT_TIMEOUT_SECONDS,
+            file=audio_file,
+            **kwargs,
+        )
+
+    # Same payload shape as the web app's OpenAI pipeline
+    # (web/lib/server/audio-update.ts): one diarized entry per segment.
+    text = " ".join((getattr(response, "text", "") or "").split())
+    language = language_hint or getattr(response, "language", None) or "unknown"
+    segments = [
+        {
+            "text": " ".join((segment.text or "").split()),
+            "start": float(segment.start or 0),
+            "end": float(segment.end or segment.start or 0),
+        }
+        for segment in getattr(response, "segments", None) or []
+    ]
+    duration = getattr(response, "duration", None) or max(
+        (segment["end"] for segment in segments), default=0.0
+    )
+    if not segments and text:
+        segments = [{"text": text, "start": 0.0, "end": float(duration)}]
+
+    request_id = f"openai_{uuid.uuid4()}"
+    return {
+        "request_id": request_id,
+        "transcript": text,
+        "timestamps": {
+            "words": [segment["text"] for segment in segments],
+            "start_time_seconds": [segment["start"] for segment in segments],
+            "end_time_seconds": [segment["end"] for segment in segments],
+        },
+        "diarized_transcript": {
+            "entries": [
+                {
+                    "transcript": segment["text"],
+                    "start_time_seconds": segment["start"],
+                    "end_time_seconds": segment["end"],
+                    "speaker_id": "spk_1",
+                }
+                for segment in segments
+            ]
+        },
+        "language_code": language,
+        "language_probability": 1 if language != "unknown" else 0,
+    }
+
+
+def _sarvam_translate(transcript: Transcript, source_lang: str) -> Transcript:
+    return translate_transcript(transcript, source_lang=source_lang)
+
+
+TRANSLATION_SCHEMA = {
+    "type": "object",
+    "additionalProperties": False,
+    "properties": {
+        "transcript_english": {"type": "string"},
+        "detected_source_language": {"type": "string"},
+        "words_english": {"type": "array", "items": {"type": "string"}},
+        "entries_english": {"type": "array", "items": {"type": "string"}},
+    },
+    "required": [
+        "transcript_english",
+        "detected_source_language",
+        "words_english",
+        "entries_english",
+    ],
+}
+
+
+def _fit(values: list[str], fallback: list[str]) -> list[str]:
+    return [
+        (values[index] if index < len(values) else "").strip() or fallback[index]
+        for index in range(len(fallback))
+    ]
+
+
+def _openai_translate(transcript: Transcript, source_lang: str) -> Transcript:
+    words = list(transcript.timestamps.words) if transcript.timestamps else []
+    entry_texts = [entry.transcript or "" for entry in transcript.entries or []]
+    source_text = transcript.transcript or ""
+
+    response = call_vendor(
+        "openai",
+        "openai.translate",
+        get_openai_client().with_options(timeout=OPENAI_TRANSLATE_TIMEOUT_SECONDS).responses.create,
+        timeout=OPENAI_TRANSLATE_TIMEOUT_SECONDS,
+        model=OPENAI_TRANSLATION_MODEL,
+        input=[
+            {
+                "role": "system",
+                "content": [
+                    {
+                        "type": "input_text",
+                        "text": (
+                            "You are a deterministic translation engine. Translate source text to "
+                            "English (en-IN). Preserve meaning, financial details, numbers, and named "
+                            "entities. Also detect source language code using BCP-47 style (e.g. "
+                            "en-IN, hi-IN, ta-IN, kn-IN). Do not add commentary."
+                        ),
+                    }
+                ],
+            },
+            {
+                "role": "user",
+                "content": [
+                    {
+                        "type": "input_text",
+                        "text": (
+                            "Translate the provided transcript payload to English. Return every "
+                            f"field in the schema.\n\nSource language: {source_lang}\n"
+                            "Target language: en-IN\nIf text is empty, keep it empty. If text is "
+                            "'<nospeech>', keep '<nospeech>'.\n\nINPUT_JSON:\n"
+                            + json.dumps(
+                                {"transcript": source_text, "words": words, "entries": entry_texts},
+                                ensure_ascii=False,
+                            )
+                        ),
+                    }
+                ],
+            },
+        ],
+        text={
+            "format": {
+                "type": "json_schema",
+                "name": "translation_output",
+                "schema": TRANSLATION_SCHEMA,
+                "strict": True,
+            }
+        },
+    )
+    output = json.loads(response_text(response))
+
+    transcript.transcript_english = output["transcript_english"].strip() or source_text
+    if transcript.timestamps is not None:
+        transcript.timestamps.words_english = _fit(output["words_english"], words)
+    for entry, english in zip(
+        transcript.entries or [], _fit(output["entries_english"], entry_texts)
+    ):
+        entry.transcript_english = english
+
+    detected = output["detected_source_language"].strip()
+    if transcript.language_code in (None, "", "unknown") and detected not in ("", "unknown"):
+        transcript.language_code = detected
+    return transcript
+
+
+def _provider_names(env_name: str, default: str) -> list[str]:
+    return [name.strip() for name in os.getenv(env_name, default).split(",") if name.strip()]
+
+
+STT_BACKENDS: dict[str, Provider] = {
+    "sarvam": Provider(
+        name="sarvam",
+        vendor="sarvam",
+        run=_sarvam_transcribe,
+        # Sarvam auto-detects the language when no hint is given.
+        languages=SARVAM_LANGUAGES | {None, "unknown"},
+        prior_seconds_per_unit=0.3,
+        is_configured=_sarvam_configured,
+    ),
+    "openai": Provider(
+        name="openai",
+        vendor="openai",
+        run=_openai_transcribe,
+        max_duration_s=float(os.getenv("OPENAI_STT_MAX_SECONDS", "1400")),
+        prior_seconds_per_unit=0.4,
+        is_configured=_openai_configured,
+    ),
+}
+
+TRANSLATION_BACKENDS: dict[str, Provider] = {
+    "sarvam": Provider(
+        name="sarvam",
+        vendor="sarvam",
+        run=_sarvam_translate,
+        languages=SARVAM_LANGUAGES,
+        prior_seconds_per_unit=1.0,
+        is_configured=_sarvam_configured,
+    ),
+    "openai": Provider(
+        name="openai",
+        vendor="openai",
+        run=_openai_translate,
+        prior_seconds_per_unit=2.0,
+        is_configured=_openai_configured,
+    ),
+}
+
+STT_PROVIDERS = [
+    STT_BACKENDS[name] for name in _provider_names("STT_PROVIDERS", "sarvam,openai")
+]
+TRANSLATION_PROVIDERS = [
+    TRANSLATION_BACKENDS[name]
+    for name in _provider_names("TRANSLATION_PROVIDERS", "sarvam,openai")
+]
+
+
+def transcribe(audio_path: str, language_hint: str | None = None) -> tuple[dict[str, Any], str]:
+    duration_s = probe_duration_seconds(audio_path)
+    return run_with_failover(
+        "stt",
+        STT_PROVIDERS,
+        audio_path,
+        language_hint,
+        language=language_hint,
+        duration_s=duration_s,
+        units=duration_s or 0.0,
+    )
+
+
+def translate(transcript: Transcript, source_lang: str) -> tuple[Transcript, str]:
+    characters = len(transcript.transcript or "")
+    # Sarvam only accepts the languages it knows; route on the script-level
+    # guess the translator itself would use.
+    language = infer_source_language(transcript.transcript or "", source_lang)
+    return run_with_failover(
+        "translation",
+        TRANSLATION_PROVIDERS,
+        transcript,
+        source_lang,
+        language=language,
+        duration_s=None,
+        units=characters / 1000,
+    )
+
+
+def router_stats() -> dict[str, dict[str, Any]]:
+    stats: dict[str, dict[str, Any]] = {}
+    for stage, providers in (("stt", STT_PROVIDERS), ("translation", TRANSLATION_PROVIDERS)):
+        for provider in providers:
+            stats[f"{stage}.{provider.name}"] = {
+                "seconds_per_unit": provider.stats.seconds_per_unit,
+                "error_rate": round(provider.stats.error_rate, 3),
+                "calls": provider.stats.calls,
+                "breaker": get_breaker(provider.vendor).state,
+            }
+    return stats
@@ -0,0 +1,291 @@
+"""Incremental re-analysis of a stored call after review corrections.
+
+An edit changes the source text of some diarized entries or of character
+spans of ``transcript``. Word chunks and entries are aligned against the
+transcript (the same alignment the translator uses), so every edit maps to
+the exact words and entries it touches. Only those are retranslated and
+reclassified; ``transcript_english`` is recomposed from the pieces, and
+insights (which read the whole call) are refreshed once.
+"""
+
+from dataclasses import dataclass, field
+
+from pydantic import BaseModel
+
+from providers import translate as translate_with_router
+from transcript_model import DiarizedEntry, Transcript
+from translator import locate_spans
+
+
+class EntryEdit(BaseModel):
+    index: int
+    # New source-language text; retranslated.
+    transcript: str | None = None
+    # Corrected English; taken as-is, no retranslation.
+    transcript_english: str | None = None
+
+
+class SpanEdit(BaseModel):
+    # Character offsets into the stored ``transcript``.
+    start: int
+    end: int
+    text: str
+
+
+class EditRequest(BaseModel):
+    entries: list[EntryEdit] = []
+    spans: list[SpanEdit] = []
+    refresh_insights: bool = True
+
+
+class EditError(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class RecomputePlan:
+    retranslate_words: set[int] = field(default_factory=set)
+    retranslate_entries: set[int] = field(default_factory=set)
+    # Entries whose English the reviewer supplied directly.
+    english_overrides: set[int] = field(default_factory=set)
+    reclassify: set[int] = field(default_factory=set)
+    transcript_english: bool = False
+
+    @property
+    def changed(self) -> bool:
+        return bool(
+            self.retranslate_words
+            or self.retranslate_entries
+            or self.english_overrides
+            or self.reclassify
+            or self.transcript_english
+        )
+
+
+def _overlaps(span: tuple[int, int], edit: tuple[int, int, str]) -> bool:
+    start, end = span
+    edit_start, edit_end, _ = edit
+    if edit_start == edit_end:
+        return start <= edit_start <= end
+    return start < edit_end and edit_start < end
+
+
+def _shift(position: int, edits: list[tuple[int, int, str]], *, is_start: bool) -> int:
+    shift = 0
+    for edit_start, edit_end, text in edits:
+        # An insertion exactly at a span start belongs to that span.
+        if edit_end < position or (edit_end == position and (not is_start or edit_start < position)):
+            shift += len(text) - (edit_end - edit_start)
+    return position + shift
+
+
+def _remap(
+    span: tuple[int, int], edits: list[tuple[int, int, str]]
+) -> tuple[int, int] | None:
+    touching = [edit for edit in edits if _overlaps(span, edit)]
+    if not touching:
+        return None
+    start = min(span[0], touching[0][0])
+    end = max(span[1], touching[-1][1])
+    return _shift(start, edits, is_start=True), _shift(end, edits, is_start=False)
+
+
+def apply_edits(transcript: Transcript, request: EditRequest) -> RecomputePlan:
+    """Applies source/English edits in place and returns the work they imply."""
+    plan = RecomputePlan()
+    entries = transcript.entries or []
+    timestamps = transcript.timestamps
+    words = timestamps.words if timestamps is not None else []
+
+    reference = transcript.transcript or ""
+    word_spans = locate_spans(reference, words)
+    entry_spans = locate_spans(reference, [entry.transcript for entry in entries])
+
+    source_edits: list[tuple[int, int, str]] = []
+    english_overrides: dict[int, str] = {}
+    for edit in request.entries:
+        if not 0 <= edit.index < len(entries):
+            raise EditError(f"entry index {edit.index} out of range")
+        if edit.transcript is not None:
+            span = entry_spans[edit.index]
+            if span is None:
+                # Not aligned to the transcript, so nothing else depends on it.
+                entries[edit.index].transcript = edit.transcript
+                plan.retranslate_entries.add(edit.index)
+            else:
+                source_edits.append((span[0], span[1], edit.transcript))
+        if edit.transcript_english is not None:
+            english_overrides[edit.index] = edit.transcript_english
+
+    for edit in request.spans:
+        if not 0 <= edit.start <= edit.end <= len(reference):
+            raise EditError(f"span {edit.start}:{edit.end} outside transcript")
+        source_edits.append((edit.start, edit.end, edit.text))
+
+    source_edits.sort(key=lambda edit: (edit[0], edit[1]))
+    for previous, current in zip(source_edits, source_edits[1:]):
+        if current[0] < previous[1]:
+            raise EditError("edits overlap; send one edit per region")
+
+    if source_edits:
+        pieces: list[str] = []
+        cursor = 0
+        for start, end, text in source_edits:
+            pieces.append(reference[cursor:start])
+            pieces.append(text)
+            cursor = end
+        pieces.append(reference[cursor:])
+        updated = "".join(pieces)
+
+        for index, span in enumerate(word_spans):
+            new_span = _remap(span, source_edits) if span else None
+            if new_span is not None:
+                words[index] = updated[new_span[0] : new_span[1]].strip()
+                plan.retranslate_words.add(index)
+        for index, span in enumerate(entry_spans):
+            new_span = _remap(span, source_edits) if span else None
+            if new_span is not None:
+                entries[index].transcript = updated[new_span[0] : new_span[1]].strip()
+                plan.retranslate_entries.add(index)
+
+        if transcript.transcript is not None:
+            transcript.transcript = updated
+        plan.transcript_english = True
+
+    for index, english in english_overrides.items():
+        entries[index].transcript_english = english
+        plan.retranslate_entries.discard(index)
+        plan.english_overrides.add(index)
+        plan.transcript_english = True
+
+    plan.reclassify = plan.retranslate_entries | set(english_overrides)
+    if plan.retranslate_entries:
+        plan.transcript_english = True
+    return plan
+
+
+def _joined(texts: list[str | None]) -> str:
+    return " ".join(text.strip() for text in texts if text and text.strip())
+
+
+def _word_run(words: list[str], text: str | None) -> tuple[int, int] | None:
+    """Finds consecutive words whose joined text equals ``text``."""
+    target = " ".join((text or "").split())
+    if not target:
+        return None
+    for first in range(len(words)):
+        joined = ""
+        for last in range(first, len(words)):
+            joined = _joined([joined, words[last]])
+            if joined == target:
+                return first, last + 1
+            if len(joined) >= len(target):
+                break
+    return None
+
+
+def _spread(english: str, count: int) -> list[str]:
+    """Splits ``english`` over ``count`` word chunks so they join back to it."""
+    tokens = english.split()
+    return [
+        " ".join(tokens[index * len(tokens) // count : (index + 1) * len(tokens) // count])
+        for index in range(count)
+    ]
+
+
+def _compose_transcript_english(
+    transcript: Transcript, *, prefer_entries: bool = False
+) -> str | None:
+    """Rebuilds transcript_english from whichever granularity tiles the transcript."""
+    target = " ".join((transcript.transcript or "").split())
+    timestamps = transcript.timestamps
+    entries = transcript.entries or []
+    candidates: list[tuple[list[str | None], list[str | None]]] = []
+    if timestamps is not None and timestamps.words_english is not None:
+        candidates.append((list(timestamps.words), list(timestamps.words_english)))
+    if entries:
+        entry_pair = (
+            [entry.transcript for entry in entries],
+            [entry.transcript_english for entry in entries],
+        )
+        # Reviewer English lives on the entries; compose from them first.
+        candidates.insert(0 if prefer_entries else len(candidates), entry_pair)
+    for source, english in candidates:
+        if " ".join(_joined(source).split()) == target:
+            return _joined(english)
+    return None
+
+
+def retranslate(transcript: Transcript, plan: RecomputePlan, source_lang: str) -> dict[str, int]:
+    """Translates only the words/entries in the plan; returns translation metrics."""
+    timestamps = transcript.timestamps
+    entries = transcript.entries or []
+    words = timestamps.words if timestamps is not None else []
+
+    # An entry made of whole word chunks is composed from their translations
+    # rather than translated again, so one edited sentence costs one sentence.
+    composed_entries: dict[int, tuple[int, int]] = {}
+    for index in plan.retranslate_entries:
+        run = _word_run(words, entries[index].transcript)
+        if run is not None:
+            composed_entries[index] = run
+            plan.retranslate_words.update(
+                word for word in range(*run) if timestamps.words_english is None
+            )
+
+    texts: list[str] = []
+    for index in sorted(plan.retranslate_words):
+        texts.append(words[index])
+    for index in sorted(plan.retranslate_entries - composed_entries.keys()):
+        texts.append(entries[index].transcript or "")
+
+    english: dict[str, str] = {}
+    metrics: dict[str, int] = {"chars_translated": 0, "calls": 0}
+    unique = list(dict.fromkeys(texts))
+    if unique:
+        batch = Transcript(entries=[DiarizedEntry(transcript=text) for text in unique])
+        translate_with_router(batch, source_lang)
+        english = {
+            text: entry.transcript_english or text
+            for text, entry in zip(unique, batch.entries)
+        }
+        metrics = batch.metrics.get("translation", metrics)
+
+    if timestamps is not None and plan.retranslate_words:
+        words_english = list(timestamps.words_english or timestamps.words)
+        for index in plan.retranslate_words:
+            words_english[index] = english[timestamps.words[index]]
+        timestamps.words_english = words_english
+    for index in plan.retranslate_entries:
+        if index in composed_entries:
+            first, last = composed_entries[index]
+            entries[index].transcript_english = _joined(timestamps.words_english[first:last])
+        else:
+            entries[index].transcript_english = english[entries[index].transcript or ""]
+
+    # Carry reviewer English down to the word chunks an entry is made of, so
+    # later compositions from words keep the correction.
+    if timestamps is not None and timestamps.words_english is not None:
+        for index in plan.english_overrides:
+            run = _word_run(words, entries[index].transcript)
+            if run is not None:
+                first, last = run
+                timestamps.words_english[first:last] = _spread(
+                    entries[index].transcript_english or "", last - first
+                )
+
+    if plan.transcript_english and transcript.transcript is not None:
+        composed = _compose_transcript_english(
+            transcript, prefer_entries=bool(plan.english_overrides)
+        )
+        if composed is None:
+            # Neither words nor entries tile the transcript; translate it whole.
+            whole = Transcript(transcript=transcript.transcript)
+            translate_with_router(whole, source_lang)
+            composed = whole.transcript_english
+            metrics = {
+                key: metrics.get(key, 0) + whole.metrics.get("translation", {}).get(key, 0)
+                for key in ("chars_translated", "calls")
+            }
+        transcript.transcript_english = composed
+    return metrics
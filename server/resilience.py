@@ -0,0 +1,306 @@
+import asyncio
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Awaitable, Callable, TypeVar
+
+from profiling import bind_stage
+
+T = TypeVar("T")
+
+
+def _env_float(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+HEDGE_ENABLED = os.getenv("HEDGE_ENABLED", "0") == "1"
+# Fire the duplicate once the primary is slower than this percentile.
+HEDGE_PERCENTILE = _env_float("HEDGE_PERCENTILE", 95)
+# Without enough samples the percentile is noise; don't hedge until then.
+HEDGE_MIN_SAMPLES = int(_env_float("HEDGE_MIN_SAMPLES", 20))
+# At most this fraction of calls may be duplicated.
+HEDGE_BUDGET_RATIO = _env_float("HEDGE_BUDGET_RATIO", 0.1)
+BREAKER_FAILURES = int(_env_float("BREAKER_FAILURES", 5))
+BREAKER_RESET_SECONDS = _env_float("BREAKER_RESET_SECONDS", 30)
+
+_hedge_pool = ThreadPoolExecutor(
+    max_workers=int(_env_float("HEDGE_POOL_SIZE", 32)),
+    thread_name_prefix="vendor-call",
+)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised instead of calling a vendor whose breaker is open."""
+
+
+class VendorTimeoutError(TimeoutError):
+    pass
+
+
+class LatencyTracker:
+    """Rolling window of successful call latencies."""
+
+    def __init__(self, size: int = 200) -> None:
+        self._samples: deque[float] = deque(maxlen=size)
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float) -> None:
+        with self._lock:
+            self._samples.append(seconds)
+
+    def percentile(self, pct: float) -> float | None:
+        with self._lock:
+            if len(self._samples) < HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._samples)
+        index = min(len(ordered) - 1, int(len(ordered) * pct / 100))
+        return ordered[index]
+
+
+class HedgeBudget:
+    """Allows hedges while hedges <= ratio * calls (plus one to start)."""
+
+    def __init__(self, ratio: float) -> None:
+        self.ratio = ratio
+        self.calls = 0
+        self.hedges = 0
+        self._lock = threading.Lock()
+
+    def record_call(self) -> None:
+        with self._lock:
+            self.calls += 1
+
+    def try_spend(self) -> bool:
+        with self._lock:
+            if self.hedges + 1 > self.ratio * self.calls + 1:
+                return False
+            self.hedges += 1
+            return True
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures, then lets one probe through after a cool-down."""
+
+    def __init__(self, name: str, failure_threshold: int, reset_seconds: float) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at: float | None = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        with self._lock:
+            if self.opened_at is None:
+                return "closed"
+            if time.monotonic() - self.opened_at >= self.reset_seconds:
+                return "half_open"
+            return "open"
+
+    @property
+    def is_open(self) -> bool:
+        return self.state == "open"
+
+    def before_call(self) -> None:
+        with self._lock:
+            if self.opened_at is None:
+                return
+            if time.monotonic() - self.opened_at < self.reset_seconds or self._probe_in_flight:
+                raise CircuitOpenError(f"{self.name} circuit open")
+            self._probe_in_flight = True
+
+    def release_probe(self) -> None:
+        """Gives up a half-open probe without an outcome (the caller was cancelled)."""
+        with self._lock:
+            self._probe_in_flight = False
+
+    def record_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.failures >= self.failure_threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+
+
+_breakers: dict[str, CircuitBreaker] = {}
+_trackers: dict[str, LatencyTracker] = {}
+_budgets: dict[str, HedgeBudget] = {}
+_registry_lock = threading.Lock()
+
+
+def get_breaker(vendor: str) -> CircuitBreaker:
+    with _registry_lock:
+        if vendor not in _breakers:
+            _breakers[vendor] = CircuitBreaker(vendor, BREAKER_FAILURES, BREAKER_RESET_SECONDS)
+        return _breakers[vendor]
+
+
+def _tracker(operation: str) -> LatencyTracker:
+    with _registry_lock:
+        return _trackers.setdefault(operation, LatencyTracker())
+
+
+def _budget(operation: str) -> HedgeBudget:
+    with _registry_lock:
+        return _budgets.setdefault(operation, HedgeBudget(HEDGE_BUDGET_RATIO))
+
+
+def breaker_states() -> dict[str, str]:
+    with _registry_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.state for breaker in breakers}
+
+
+def _hedge_delay(operation: str, hedge: bool) -> float | None:
+    if not (hedge and HEDGE_ENABLED):
+        return None
+    return _tracker(operation).percentile(HEDGE_PERCENTILE)
+
+
+def call_vendor(
+    vendor: str,
+    operation: str,
+    fn: Callable[..., T],
+    *args: Any,
+    hedge: bool = False,
+    timeout: float | None = None,
+    **kwargs: Any,
+) -> T:
+    """Calls a blocking vendor function behind the vendor's circuit breaker.
+
+    With ``hedge=True`` (only for idempotent calls) and ``HEDGE_ENABLED=1``, a
+    duplicate is fired once the primary is slower than the operation's
+    ``HEDGE_PERCENTILE`` latency, within ``HEDGE_BUDGET_RATIO``, and the first
+    successful result wins.
+
+    ``timeout`` should match the timeout configured on the vendor's client:
+    blocking calls are not abandoned in a thread, so the client is what
+    actually stops a slow call. A failure after ``timeout`` is reported as
+    ``VendorTimeoutError``; a hedged call also stops waiting at ``timeout``.
+    """
+    breaker = get_breaker(vendor)
+    breaker.before_call()
+    budget = _budget(operation)
+    budget.record_call()
+    delay = _hedge_delay(operation, hedge)
+
+    started = time.monotonic()
+    if delay is None:
+        try:
+            result = fn(*args, **kwargs)
+        except Exception as exc:
+            breaker.record_failure()
+            if timeout is not None and time.monotonic() - started >= timeout:
+                raise VendorTimeoutError(
+                    f"{vendor} {operation} timed out after {timeout}s"
+                ) from exc
+            raise
+        except BaseException:
+            breaker.release_probe()
+            raise
+        breaker.record_success()
+        _tracker(operation).record(time.monotonic() - started)
+        return result
+
+    deadline = None if timeout is None else started + timeout
+    fn = bind_stage(fn)
+    pending: set[Future[T]] = {_hedge_pool.submit(fn, *args, **kwargs)}
+    hedged = False
+    error: BaseException | None = None
+
+    while pending:
+        wait_for = delay if not hedged else None
+        if deadline is not None:
+            remaining = max(0.0, deadline - time.monotonic())
+            wait_for = remaining if wait_for is None else min(wait_for, remaining)
+        done, pending = wait(pending, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+        for future in done:
+            if future.exception() is None:
+                breaker.record_success()
+                _tracker(operation).record(time.monotonic() - started)
+                return future.result()
+            error = future.exception()
+
+        if deadline is not None and time.monotonic() >= deadline:
+            break
+        if not hedged and not done:
+            hedged = True
+            if budget.try_spend():
+                pending.add(_hedge_pool.submit(fn, *args, **kwargs))
+
+    breaker.record_failure()
+    if error is not None and not pending:
+        raise error
+    raise VendorTimeoutError(f"{vendor} {operation} timed out after {timeout}s")
+
+
+async def call_vendor_async(
+    vendor: str,
+    operation: str,
+    fn: Callable[..., Awaitable[T]],
+    *args: Any,
+    hedge: bool = False,
+    timeout: float | None = None,
+    **kwargs: Any,
+) -> T:
+    """Async counterpart of ``call_vendor`` for coroutine-based SDKs."""
+    breaker = get_breaker(vendor)
+    breaker.before_call()
+    budget = _budget(operation)
+    budget.record_call()
+    delay = _hedge_delay(operation, hedge)
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    deadline = None if timeout is None else started + timeout
+    pending: set[asyncio.Task[T]] = {asyncio.ensure_future(fn(*args, **kwargs))}
+    hedged = delay is None
+    error: BaseException | None = None
+
+    try:
+        while pending:
+            wait_for = delay if not hedged else None
+            if deadline is not None:
+                remaining = max(0.0, deadline - loop.time())
+                wait_for = remaining if wait_for is None else min(wait_for, remaining)
+            done, pending = await asyncio.wait(
+                pending, timeout=wait_for, return_when=asyncio.FIRST_COMPLETED
+            )
+
+            for task in done:
+                if task.exception() is None:
+                    breaker.record_success()
+                    _tracker(operation).record(loop.time() - started)
+                    return task.result()
+                error = task.exception()
+
+            if deadline is not None and loop.time() >= deadline:
+                break
+            if not hedged and not done:
+                hedged = True
+                if budget.try_spend():
+                    pending.add(asyncio.ensure_future(fn(*args, **kwargs)))
+    except asyncio.CancelledError:
+        # Cancelled by the caller (e.g. an outer wait_for): no outcome to
+        # record, but a half-open probe must not stay claimed forever.
+        breaker.release_probe()
+        raise
+    finally:
+        for task in pending:
+            task.cancel()
+
+    breaker.record_failure()
+    if error is not None and not pending:
+        raise error
+    raise VendorTimeoutError(f"{vendor} {operation} timed out after {timeout}s")
@@ -0,0 +1,121 @@
+import gzip
+import json
+from typing import Any
+
+from fastapi import Response
+
+from transcript_model import DiarizedEntry, Transcript
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - optional speedup
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - optional speedup
+    msgpack = None
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional speedup
+    brotli = None
+
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+JSON_MEDIA_TYPE = "application/json"
+
+# Bodies smaller than this are sent uncompressed; the framing overhead of
+# gzip/brotli outweighs the savings on tiny payloads.
+MIN_COMPRESS_BYTES = 1024
+
+
+def _entry_columns(entries: list[DiarizedEntry]) -> dict[str, list[Any]]:
+    return {
+        "transcript": [entry.transcript for entry in entries],
+        "transcript_english": [entry.transcript_english for entry in entries],
+        "start_time_seconds": [entry.start_time_seconds for entry in entries],
+        "end_time_seconds": [entry.end_time_seconds for entry in entries],
+        "speaker_id": [entry.speaker_id for entry in entries],
+    }
+
+
+def _intent_columns(entries: list[DiarizedEntry]) -> dict[str, list[Any]]:
+    labels: list[str | None] = []
+    reasons: list[str | None] = []
+    for entry in entries:
+        result = entry.intent_classification or {}
+        labels.append(result.get("label"))
+        reasons.append(result.get("reason"))
+    return {"labels": labels, "reasons": reasons}
+
+
+def build_compact_response(
+    transcript: Transcript,
+    insights_payload: dict[str, Any],
+    *,
+    intents_ran: bool,
+) -> dict[str, Any]:
+    """Builds the compact response shape.
+
+    The transcript document is sent once; intent results become label/reason
+    arrays aligned to ``diarized_transcript.entries`` by index, and diarized
+    entries use the same parallel-array layout as ``timestamps``.
+    """
+    entries = transcript.entries
+    compact = transcript.to_dict()
+    if entries is not None:
+        compact["diarized_transcript"] = {"columns": _entry_columns(entries)}
+
+    compact["intents"] = _intent_columns(entries or []) if intents_ran else None
+    compact["insights"] = insights_payload.get("insights")
+    compact["ui_spec"] = insights_payload.get("ui_spec")
+    return compact
+
+
+def _accepts(header: str | None, token: str) -> bool:
+    if not header:
+        return False
+    for part in header.split(","):
+        name, _, params = part.strip().partition(";")
+        if name.strip().lower() != token:
+            continue
+        if params.strip().replace(" ", "").lower() in {"q=0", "q=0.0", "q=0.00"}:
+            return False
+        return True
+    return False
+
+
+def _serialize(payload: Any, accept: str | None) -> tuple[bytes, str]:
+    if msgpack is not None and _accepts(accept, MSGPACK_MEDIA_TYPE):
+        return msgpack.packb(payload, use_bin_type=True), MSGPACK_MEDIA_TYPE
+    if orjson is not None:
+        return orjson.dumps(payload), JSON_MEDIA_TYPE
+    return (
+        json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8"),
+        JSON_MEDIA_TYPE,
+    )
+
+
+def _compress(body: bytes, accept_encoding: str | None) -> tuple[bytes, str | None]:
+    if len(body) < MIN_COMPRESS_BYTES:
+        return body, None
+    if brotli is not None and _accepts(accept_encoding, "br"):
+        return brotli.compress(body, quality=5), "br"
+    if _accepts(accept_encoding, "gzip"):
+        return gzip.compress(body, compresslevel=6), "gzip"
+    return body, None
+
+
+def encode_response(
+    payload: Any,
+    *,
+    accept: str | None = None,
+    accept_encoding: str | None = None,
+) -> Response:
+    body, media_type = _serialize(payload, accept)
+    body, content_encoding = _compress(body, accept_encoding)
+
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if content_encoding:
+        headers["Content-Encoding"] = content_encoding
+    return Response(content=body, media_type=media_type, headers=headers)
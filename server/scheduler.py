@@ -0,0 +1,217 @@
+"""Weighted-fair scheduling of vendor-bound pipeline stages.
+
+Interactive uploads, streams, edits and batch backfills share the same vendor
+capacity. Each vendor-bound stage (STT, translation, intents, insights) holds
+one of ``SCHEDULER_SLOTS`` while it runs and gives it back when it ends, so a
+request queues again between stages. Slots are per worker process: the vendor
+concurrency of a deployment is ``SCHEDULER_SLOTS`` times ``WEB_CONCURRENCY``. When a slot frees, the class with
+the least service relative to its weight goes next (stride scheduling), and
+within a class the earliest deadline goes first. Interactive work therefore
+overtakes queued batch work at every stage boundary, while batch still gets
+its weighted share instead of starving.
+
+A request may carry a deadline. A stage whose estimated duration no longer
+fits in the time left is shed rather than run, whether it is about to start
+or still queued. Stage durations are estimated from recent runs.
+"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterator
+
+# Per worker; size it as the vendor concurrency budget / WEB_CONCURRENCY.
+SCHEDULER_SLOTS = int(os.getenv("SCHEDULER_SLOTS", "8"))
+SCHEDULER_WEIGHTS = {
+    "interactive": float(os.getenv("SCHEDULER_INTERACTIVE_WEIGHT", "8")),
+    "batch": float(os.getenv("SCHEDULER_BATCH_WEIGHT", "1")),
+}
+# Waiting stages per class before new ones are shed outright.
+SCHEDULER_MAX_QUEUED = int(os.getenv("SCHEDULER_MAX_QUEUED", "256"))
+SCHEDULER_ALPHA = 0.2
+
+
+class SchedulerShed(RuntimeError):
+    """Raised instead of running a stage that cannot meet its deadline."""
+
+
+@dataclass(slots=True)
+class Ticket:
+    priority: str
+    seq: int
+    admitted: float
+    # time.monotonic() by which the request must finish; None waits forever.
+    deadline: float | None = None
+
+
+@dataclass(slots=True)
+class ClassStats:
+    queued: int = 0
+    running: int = 0
+    admitted: int = 0
+    completed: int = 0
+    shed: int = 0
+    queue_wait: deque[float] = field(default_factory=lambda: deque(maxlen=500))
+    latency: deque[float] = field(default_factory=lambda: deque(maxlen=500))
+
+
+def _percentiles(samples: deque[float]) -> dict[str, float] | None:
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return {
+        f"p{pct}": round(ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))] * 1000, 1)
+        for pct in (50, 95, 99)
+    }
+
+
+class Scheduler:
+    """Hands out stage slots; every method runs on the event loop."""
+
+    def __init__(self, slots: int, weights: dict[str, float]) -> None:
+        if slots < 1 or any(weight <= 0 for weight in weights.values()):
+            raise ValueError("scheduler needs at least one slot and positive weights")
+        self.slots = slots
+        self.weights = weights
+        self.running = 0
+        self.stats = {priority: ClassStats() for priority in weights}
+        # Per class heap of (deadline, ticket seq, future granted the slot).
+        self._queues: dict[str, list[tuple[float, int, asyncio.Future[None]]]] = {
+            priority: [] for priority in weights
+        }
+        self._pass = {priority: 0.0 for priority in weights}
+        self._virtual_time = 0.0
+        self._stage_seconds: dict[str, float] = {}
+        self._seq = itertools.count()
+
+    def admit(self, priority: str, deadline_ms: int | None = None) -> Ticket:
+        now = time.monotonic()
+        self.stats[priority].admitted += 1
+        return Ticket(
+            priority=priority,
+            seq=next(self._seq),
+            admitted=now,
+            deadline=now + deadline_ms / 1000 if deadline_ms is not None else None,
+        )
+
+    def complete(self, ticket: Ticket, *, succeeded: bool, record_latency: bool = True) -> None:
+        stats = self.stats[ticket.priority]
+        stats.completed += 1
+        if succeeded and record_latency:
+            stats.latency.append(time.monotonic() - ticket.admitted)
+
+    @asynccontextmanager
+    async def stage(self, ticket: Ticket, name: str) -> AsyncIterator[None]:
+        stats = self.stats[ticket.priority]
+        budget: float | None = None
+        if ticket.deadline is not None:
+            estimate = self._stage_seconds.get(name, 0.0)
+            budget = ticket.deadline - time.monotonic() - estimate
+            if budget <= 0:
+                self._shed(ticket, name, "cannot finish before its deadline")
+        if stats.queued >= SCHEDULER_MAX_QUEUED:
+            self._shed(ticket, name, "queue is full")
+
+        future: asyncio.Future[None] = asyncio.get_running_loop().create_future()
+        heapq.heappush(
+            self._queues[ticket.priority],
+            (ticket.deadline if ticket.deadline is not None else math.inf, ticket.seq, future),
+        )
+        if stats.queued == 0:
+            # A class coming back from idle starts at the current virtual
+            # time, not with credit banked while it had nothing queued.
+            self._pass[ticket.priority] = max(self._pass[ticket.priority], self._virtual_time)
+        stats.queued += 1
+        queued_at = time.monotonic()
+        self._dispatch()
+
+        try:
+            done, _ = await asyncio.wait((future,), timeout=budget)
+        except asyncio.CancelledError:
+            self._abandon(ticket, future)
+            raise
+        if not done:
+            self._abandon(ticket, future)
+            self._shed(ticket, name, "deadline passed while queued")
+
+        stats.queue_wait.append(time.monotonic() - queued_at)
+        stats.running += 1
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            elapsed = time.monotonic() - started
+            previous = self._stage_seconds.get(name)
+            self._stage_seconds[name] = (
+                elapsed if previous is None else previous + SCHEDULER_ALPHA * (elapsed - previous)
+            )
+            stats.running -= 1
+            self._release()
+
+    def _next_class(self) -> str | None:
+        waiting = [priority for priority, queue in self._queues.items() if queue]
+        if not waiting:
+            return None
+        return min(waiting, key=lambda priority: (self._pass[priority], -self.weights[priority]))
+
+    def _dispatch(self) -> None:
+        while self.running < self.slots:
+            priority = self._next_class()
+            if priority is None:
+                return
+            _, _, future = heapq.heappop(self._queues[priority])
+            if future.cancelled():
+                continue
+            self._virtual_time = self._pass[priority]
+            self._pass[priority] += 1 / self.weights[priority]
+            self.stats[priority].queued -= 1
+            self.running += 1
+            future.set_result(None)
+
+    def _release(self) -> None:
+        self.running -= 1
+        self._dispatch()
+
+    def _abandon(self, ticket: Ticket, future: asyncio.Future[None]) -> None:
+        if future.done():
+            # Granted just as the waiter gave up; pass the slot on.
+            self._release()
+        else:
+            # Left in the heap and skipped by _dispatch.
+            future.cancel()
+            self.stats[ticket.priority].queued -= 1
+
+    def _shed(self, ticket: Ticket, name: str, reason: str) -> None:
+        self.stats[ticket.priority].shed += 1
+        raise SchedulerShed(f"{name} shed: {reason}")
+
+    def snapshot(self) -> dict[str, Any]:
+        return {
+            "slots": self.slots,
+            "running": self.running,
+            "classes": {
+                priority: {
+                    "weight": self.weights[priority],
+                    "queued": stats.queued,
+                    "running": stats.running,
+                    "admitted": stats.admitted,
+                    "completed": stats.completed,
+                    "shed": stats.shed,
+                    "queue_wait_ms": _percentiles(stats.queue_wait),
+                    "latency_ms": _percentiles(stats.latency),
+                }
+                for priority, stats in self.stats.items()
+            },
+            "stage_seconds": {
+                name: round(seconds, 3) for name, seconds in self._stage_seconds.items()
+            },
+        }
+
+
+scheduler = Scheduler(SCHEDULER_SLOTS, SCHEDULER_WEIGHTS)
@@ -0,0 +1,40 @@
+"""Production entry point: pre-spawned uvicorn workers behind one socket.
+
+Each worker imports ``main:app`` and builds its own clients, schema and intent
+assistant in the app lifespan, so nothing is shared across process
+boundaries except ``INTENT_ASSISTANT_ID`` when set.
+
+    uv run python serve.py            # WEB_CONCURRENCY defaults to CPU count
+    WEB_CONCURRENCY=4 PORT=8080 uv run python serve.py
+"""
+
+import os
+
+import uvicorn
+
+
+def worker_count() -> int:
+    configured = os.getenv("WEB_CONCURRENCY")
+    if configured:
+        return max(1, int(configured))
+    return os.cpu_count() or 1
+
+
+def main() -> None:
+    uvicorn.run(
+        "main:app",
+        host=os.getenv("HOST", "0.0.0.0"),
+        port=int(os.getenv("PORT", "8000")),
+        workers=worker_count(),
+        # On SIGTERM, stop accepting connections and let in-flight uploads
+        # finish for up to this many seconds before workers exit.
+        timeout_graceful_shutdown=int(os.getenv("GRACEFUL_TIMEOUT", "60")),
+        timeout_keep_alive=int(os.getenv("KEEPALIVE_TIMEOUT", "5")),
+        proxy_headers=True,
+        forwarded_allow_ips=os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        log_level=os.getenv("LOG_LEVEL", "info"),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,12 @@
+from functools import lru_cache
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent
+
+
+@lru_cache(maxsize=1)
+def load_env() -> None:
+    """Loads server/.env once per process, however many modules ask for it."""
+    from dotenv import load_dotenv
+
+    load_dotenv(BASE_DIR / ".env")
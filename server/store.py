@@ -0,0 +1,823 @@
+"""SQLite store of processed calls, with full-text and secondary indexes.
+
+Every result is kept whole in ``calls`` and broken out into index tables
+keyed by a stable integer ``call_index.id``. Those tables hold full-text
+over ``transcript``/``transcript_english``, intent labels, entities and
+obligation due dates. They are rewritten with the document in one
+transaction, so search never sees a half-indexed call.
+
+The same transaction applies the difference between the call's old and
+new facts to ``rollups``: per-day counters that dashboards read without
+touching individual calls.
+
+Rows written before the indexes existed can be indexed with:
+
+    python store.py reindex
+
+and the rollups recomputed from the indexes (after a backfill, or if the
+bucketing changes) with:
+
+    python store.py rebuild-rollups
+"""
+
+import argparse
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta, timezone
+from functools import lru_cache
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+from local_intent import INTENT_LABELS
+from settings import BASE_DIR, load_env
+
+load_env()
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS calls (
+        request_id TEXT PRIMARY KEY,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        document TEXT NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS calls_created ON calls (created_at)",
+    # INTEGER PRIMARY KEY, unlike the implicit rowid of ``calls``, survives
+    # VACUUM, so the FTS rowids and index rows can point at it.
+    """
+    CREATE TABLE IF NOT EXISTS call_index (
+        id INTEGER PRIMARY KEY,
+        request_id TEXT NOT NULL UNIQUE,
+        created_at REAL NOT NULL,
+        language_code TEXT,
+        risk_level TEXT,
+        primary_intent TEXT,
+        needs_review INTEGER NOT NULL DEFAULT 0
+    )
+    """,
+    # Entries within one risk level are kept in id order, as search pages them.
+    "CREATE INDEX IF NOT EXISTS call_index_risk ON call_index (risk_level)",
+    """
+    CREATE TABLE IF NOT EXISTS call_labels (
+        label TEXT NOT NULL,
+        call_id INTEGER NOT NULL,
+        -- 1 when an utterance was classified with this label; only those
+        -- feed the intent rollup, not the insights' free-text intents.
+        entry_label INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (label, call_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS call_labels_call ON call_labels (call_id)",
+    """
+    CREATE TABLE IF NOT EXISTS call_entities (
+        type TEXT NOT NULL,
+        value TEXT NOT NULL,
+        call_id INTEGER NOT NULL,
+        PRIMARY KEY (type, value, call_id)
+    ) WITHOUT ROWID
+    """,
+    "CREATE INDEX IF NOT EXISTS call_entities_value ON call_entities (value)",
+    "CREATE INDEX IF NOT EXISTS call_entities_call ON call_entities (call_id)",
+    """
+    CREATE TABLE IF NOT EXISTS call_obligations (
+        due_date TEXT NOT NULL,
+        call_id INTEGER NOT NULL,
+        text TEXT
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS call_obligations_due ON call_obligations (due_date, call_id)",
+    "CREATE INDEX IF NOT EXISTS call_obligations_call ON call_obligations (call_id)",
+    # metric/bucket/key -> count. Buckets are UTC days: the day a call was
+    # stored, or an obligation's due date for ``obligations_due``.
+    """
+    CREATE TABLE IF NOT EXISTS rollups (
+        metric TEXT NOT NULL,
+        bucket TEXT NOT NULL,
+        key TEXT NOT NULL,
+        count INTEGER NOT NULL,
+        PRIMARY KEY (metric, bucket, key)
+    ) WITHOUT ROWID
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS calls_fts USING fts5 (
+        transcript,
+        transcript_english
+    )
+    """,
+)
+
+# A filter matching fewer calls than this drives the search; see ResultStore.search.
+SEARCH_DRIVE_LIMIT = int(os.getenv("SEARCH_DRIVE_LIMIT", "2000"))
+
+# /rollups without dates covers this many days either side of today, since
+# obligations fall due in the future.
+ROLLUP_DEFAULT_DAYS = int(os.getenv("ROLLUP_DEFAULT_DAYS", "30"))
+
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y", "%d-%m-%Y", "%d %B %Y", "%d %b %Y", "%B %d, %Y", "%b %d, %Y")
+WEEKDAYS = ("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")
+# Words dropped before a relative due date is matched as a whole phrase.
+DUE_DATE_FILLERS = frozenset(
+    {"a", "at", "before", "by", "coming", "due", "latest", "of", "on", "the", "till", "until"}
+)
+WEEKDAY_PHRASE = re.compile(
+    rf"(?:(?P<week_first>next week) )?(?:(?P<next>next|this) )?(?P<day>{'|'.join(WEEKDAYS)})"
+    r"(?P<week> next week)?"
+)
+DAY_OF_MONTH_PHRASE = re.compile(
+    r"(?:(?P<which_first>next|this) month )?(?P<day>\d{1,2})(?:st|nd|rd|th)?"
+    r"(?: (?P<which>next|this) month)?"
+)
+
+
+class QueryError(ValueError):
+    pass
+
+
+class StaleWriteError(RuntimeError):
+    """Raised by ``save`` when the call changed after the caller loaded it."""
+
+
+def normalize_label(value: str) -> str:
+    return value.strip().upper().replace(" ", "_")
+
+
+def normalize_value(value: str) -> str:
+    return " ".join(value.split()).casefold()
+
+
+def _day_of_month(reference: date, day: int, months_ahead: int | None) -> date | None:
+    """The given day in ``months_ahead`` months, or the next one on or after reference."""
+    if months_ahead is None:
+        months_ahead = 0 if day >= reference.day else 1
+    year, month = divmod(reference.month - 1 + months_ahead, 12)
+    try:
+        return date(reference.year + year, month + 1, day)
+    except ValueError:
+        return None
+
+
+def normalize_due_date(value: str | None, reference: date) -> str | None:
+    """Resolves an obligation's free-text due date to ISO, relative to the call date.
+
+    Handles absolute dates in common formats, "today", "tomorrow", weekday
+    names ("by Friday" is the coming one; "next Friday", "Friday next week"
+    and "next week Friday" the one in the following week), days of the month
+    ("the 5th", "5th of next month"), and "next week"/"next month" as their
+    first day. The whole phrase must match one of these once fillers like
+    "by" and "the" are dropped; anything vaguer ("end of next week") is left
+    out of the date index rather than guessed.
+    """
+    if not value:
+        return None
+    text = value.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text[:10] if fmt == "%Y-%m-%d" else text, fmt).date().isoformat()
+        except ValueError:
+            continue
+
+    words = re.findall(r"[a-z0-9]+", text.casefold())
+    phrase = " ".join(word for word in words if word not in DUE_DATE_FILLERS)
+    next_monday = reference + timedelta(days=7 - reference.weekday())
+    resolved: date | None = None
+
+    if phrase == "today":
+        resolved = reference
+    elif phrase == "tomorrow":
+        resolved = reference + timedelta(days=1)
+    elif phrase == "day after tomorrow":
+        resolved = reference + timedelta(days=2)
+    elif phrase == "next week":
+        resolved = next_monday
+    elif phrase == "next month":
+        resolved = _day_of_month(reference, 1, 1)
+    elif match := WEEKDAY_PHRASE.fullmatch(phrase):
+        index = WEEKDAYS.index(match["day"])
+        if match["next"] == "next" or match["week"] or match["week_first"]:
+            resolved = next_monday + timedelta(days=index)
+        else:
+            resolved = reference + timedelta(days=(index - reference.weekday()) % 7 or 7)
+    elif match := DAY_OF_MONTH_PHRASE.fullmatch(phrase):
+        which = match["which"] or match["which_first"]
+        months_ahead = {"next": 1, "this": 0, None: None}[which]
+        resolved = _day_of_month(reference, int(match["day"]), months_ahead)
+    return resolved.isoformat() if resolved is not None else None
+
+
+def fts_query(text: str) -> str:
+    """Quotes each term so user input is never parsed as FTS5 syntax.
+
+    A trailing ``*`` is kept as a prefix match. Terms are ANDed.
+    """
+    terms = []
+    for term in text.split():
+        prefix = term.endswith("*")
+        term = term.rstrip("*").replace('"', '""')
+        if term:
+            terms.append(f'"{term}"' + ("*" if prefix else ""))
+    if not terms:
+        raise QueryError("empty text query")
+    return " ".join(terms)
+
+
+@dataclass(slots=True)
+class CallFacts:
+    """The indexed fields of one stored document."""
+
+    transcript: str
+    transcript_english: str
+    language_code: str | None
+    risk_level: str | None
+    primary_intent: str | None
+    needs_review: bool
+    labels: set[str]
+    # Utterance labels from INTENT_LABELS, a subset of ``labels``.
+    intent_labels: set[str]
+    entities: set[tuple[str, str]]
+    obligations: list[tuple[str, str | None]]
+
+    @classmethod
+    def from_document(cls, document: dict[str, Any], created_at: float) -> "CallFacts":
+        insights = document.get("insights") or {}
+        entries = (document.get("diarized_transcript") or {}).get("entries") or []
+
+        labels = {
+            normalize_label(entry["intent_classification"]["label"])
+            for entry in entries
+            if (entry.get("intent_classification") or {}).get("label")
+        }
+        intent_labels = labels & set(INTENT_LABELS)
+        primary_intent = insights.get("primary_intent") or None
+        for intent in [primary_intent, *(insights.get("secondary_intents") or [])]:
+            if intent:
+                labels.add(normalize_label(intent))
+
+        entities = {
+            (normalize_value(entity["type"]), normalize_value(entity["value"]))
+            for entity in insights.get("entities") or []
+            if entity.get("type") and entity.get("value")
+        }
+
+        reference = datetime.fromtimestamp(created_at, tz=timezone.utc).date()
+        obligations = []
+        for obligation in insights.get("obligations") or []:
+            due = normalize_due_date(obligation.get("due_date"), reference)
+            if due is not None:
+                obligations.append((due, obligation.get("text")))
+
+        risk_level = insights.get("risk_level")
+        return cls(
+            transcript=document.get("transcript") or "",
+            transcript_english=document.get("transcript_english") or "",
+            language_code=document.get("language_code"),
+            risk_level=risk_level.lower() if risk_level else None,
+            primary_intent=primary_intent,
+            needs_review=bool((insights.get("review") or {}).get("needs_human_review")),
+            labels=labels,
+            intent_labels=intent_labels,
+            entities=entities,
+            obligations=obligations,
+        )
+
+
+class ResultStore:
+    """Processed call results keyed by request_id, in SQLite.
+
+    WAL mode lets every uvicorn worker open the same file; writes within a
+    process are serialised by a lock around the shared connection.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._lock = threading.Lock()
+        for statement in SCHEMA:
+            self._conn.execute(statement)
+        self._migrate()
+
+    def _missing_columns(self) -> set[str]:
+        missing = set()
+        for table, column in (("call_index", "needs_review"), ("call_labels", "entry_label")):
+            if column not in {row[1] for row in self._conn.execute(f"PRAGMA table_info({table})")}:
+                missing.add(column)
+        return missing
+
+    def _migrate(self) -> None:
+        if not self._missing_columns():
+            return
+        # Workers starting together on an old store all try to migrate it;
+        # the write lock serialises them and the re-check makes the rest no-ops.
+        with self._transaction():
+            missing = self._missing_columns()
+            if "needs_review" in missing:
+                # Review flags of existing calls are picked up by ``reindex``.
+                self._conn.execute(
+                    "ALTER TABLE call_index ADD COLUMN needs_review INTEGER NOT NULL DEFAULT 0"
+                )
+            if "entry_label" in missing:
+                # Best guess until ``reindex`` rewrites the labels exactly.
+                self._conn.execute(
+                    "ALTER TABLE call_labels ADD COLUMN entry_label INTEGER NOT NULL DEFAULT 0"
+                )
+                self._conn.execute(
+                    f"UPDATE call_labels SET entry_label = 1 WHERE label IN "
+                    f"({', '.join('?' * len(INTENT_LABELS))})",
+                    INTENT_LABELS,
+                )
+            if missing:
+                # Start the counters from the indexes so later deltas apply
+                # to a consistent base.
+                self._rebuild_rollups()
+
+    def save(
+        self,
+        request_id: str,
+        document: dict[str, Any],
+        *,
+        expected_updated_at: float | None = None,
+    ) -> float:
+        """Writes the call and returns its new ``updated_at``.
+
+        With ``expected_updated_at`` (as returned by ``load_versioned``) the
+        write only goes through if nobody saved the call in between.
+        """
+        now = time.time()
+        body = json.dumps(document, ensure_ascii=False)
+        with self._lock, self._transaction():
+            if expected_updated_at is not None:
+                row = self._conn.execute(
+                    "SELECT updated_at FROM calls WHERE request_id = ?", (request_id,)
+                ).fetchone()
+                if row is None or row[0] != expected_updated_at:
+                    raise StaleWriteError(f"call {request_id} changed since it was loaded")
+                # Keep versions distinct even if the clock has not moved on.
+                now = max(now, expected_updated_at + 1e-6)
+            created_at = self._conn.execute(
+                """
+                INSERT INTO calls (request_id, created_at, updated_at, document)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(request_id) DO UPDATE SET
+                    updated_at = excluded.updated_at,
+                    document = excluded.document
+                RETURNING created_at
+                """,
+                (request_id, now, now, body),
+            ).fetchone()[0]
+            self._index(request_id, created_at, document)
+        return now
+
+    def load(self, request_id: str) -> dict[str, Any] | None:
+        loaded = self.load_versioned(request_id)
+        return loaded[0] if loaded else None
+
+    def load_versioned(self, request_id: str) -> tuple[dict[str, Any], float] | None:
+        """The stored document and its ``updated_at``, for ``save`` to check."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT document, updated_at FROM calls WHERE request_id = ?", (request_id,)
+            ).fetchone()
+        return (json.loads(row[0]), row[1]) if row else None
+
+    def _selective_filter(self, filters: list[tuple[str, str, list[Any]]]) -> int | None:
+        """Index of the filter matching fewest calls, if under SEARCH_DRIVE_LIMIT."""
+        best: int | None = None
+        best_count = SEARCH_DRIVE_LIMIT
+        for index, (subquery, _, params) in enumerate(filters):
+            count = self._conn.execute(
+                f"SELECT count(*) FROM ({subquery} LIMIT ?)", [*params, best_count]
+            ).fetchone()[0]
+            if count < best_count:
+                best, best_count = index, count
+        return best
+
+    @contextmanager
+    def _transaction(self) -> Iterator[None]:
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield
+        except BaseException:
+            self._conn.execute("ROLLBACK")
+            raise
+        self._conn.execute("COMMIT")
+
+    def _index(self, request_id: str, created_at: float, document: dict[str, Any]) -> None:
+        facts = CallFacts.from_document(document, created_at)
+        conn = self._conn
+        delta = _contributions(
+            created_at,
+            facts.risk_level,
+            facts.needs_review,
+            facts.intent_labels,
+            [due for due, _ in facts.obligations],
+        )
+        previous = conn.execute(
+            "SELECT id, created_at, risk_level, needs_review FROM call_index WHERE request_id = ?",
+            (request_id,),
+        ).fetchone()
+        if previous is not None:
+            old_id, old_created_at, old_risk, old_review = previous
+            delta.subtract(
+                _contributions(
+                    old_created_at,
+                    old_risk,
+                    bool(old_review),
+                    self._column(
+                        "SELECT label FROM call_labels WHERE call_id = ? AND entry_label", old_id
+                    ),
+                    self._column("SELECT due_date FROM call_obligations WHERE call_id = ?", old_id),
+                )
+            )
+        self._apply_rollups(delta)
+
+        call_id = conn.execute(
+            """
+            INSERT INTO call_index
+                (request_id, created_at, language_code, risk_level, primary_intent, needs_review)
+            VALUES (?, ?, ?, ?, ?, ?)
+            ON CONFLICT(request_id) DO UPDATE SET
+                language_code = excluded.language_code,
+                risk_level = excluded.risk_level,
+                primary_intent = excluded.primary_intent,
+                needs_review = excluded.needs_review
+            RETURNING id
+            """,
+            (
+                request_id,
+                created_at,
+                facts.language_code,
+                facts.risk_level,
+                facts.primary_intent,
+                facts.needs_review,
+            ),
+        ).fetchone()[0]
+
+        for table in ("call_labels", "call_entities", "call_obligations"):
+            conn.execute(f"DELETE FROM {table} WHERE call_id = ?", (call_id,))
+        conn.execute("DELETE FROM calls_fts WHERE rowid = ?", (call_id,))
+
+        conn.executemany(
+            "INSERT INTO call_labels (label, call_id, entry_label) VALUES (?, ?, ?)",
+            [(label, call_id, label in facts.intent_labels) for label in facts.labels],
+        )
+        conn.executemany(
+            "INSERT INTO call_entities (type, value, call_id) VALUES (?, ?, ?)",
+            [(kind, value, call_id) for kind, value in facts.entities],
+        )
+        conn.executemany(
+            "INSERT INTO call_obligations (due_date, call_id, text) VALUES (?, ?, ?)",
+            [(due, call_id, text) for due, text in facts.obligations],
+        )
+        conn.execute(
+            "INSERT INTO calls_fts (rowid, transcript, transcript_english) VALUES (?, ?, ?)",
+            (call_id, facts.transcript, facts.transcript_english),
+        )
+
+    def _column(self, query: str, *params: Any) -> list[Any]:
+        return [row[0] for row in self._conn.execute(query, params)]
+
+    def _apply_rollups(self, delta: Counter) -> None:
+        self._conn.executemany(
+            """
+            INSERT INTO rollups (metric, bucket, key, count) VALUES (?, ?, ?, ?)
+            ON CONFLICT(metric, bucket, key) DO UPDATE SET count = count + excluded.count
+            """,
+            [(*slot, count) for slot, count in delta.items() if count],
+        )
+        self._conn.executemany(
+            "DELETE FROM rollups WHERE metric = ? AND bucket = ? AND key = ? AND count = 0",
+            [slot for slot, count in delta.items() if count < 0],
+        )
+
+    def rebuild_rollups(self) -> int:
+        """Recomputes every rollup from the index tables; returns the row count."""
+        with self._lock, self._transaction():
+            return self._rebuild_rollups()
+
+    def _rebuild_rollups(self) -> int:
+        day = "date(c.created_at, 'unixepoch')"
+        conn = self._conn
+        conn.execute("DELETE FROM rollups")
+        conn.execute(
+            f"""
+            INSERT INTO rollups (metric, bucket, key, count)
+            SELECT 'calls', {day}, '', count(*) FROM call_index AS c GROUP BY 2
+            """
+        )
+        conn.execute(
+            f"""
+            INSERT INTO rollups (metric, bucket, key, count)
+            SELECT 'risk', {day}, c.risk_level, count(*) FROM call_index AS c
+            WHERE c.risk_level IS NOT NULL GROUP BY 2, 3
+            """
+        )
+        conn.execute(
+            f"""
+            INSERT INTO rollups (metric, bucket, key, count)
+            SELECT 'needs_review', {day}, '', count(*) FROM call_index AS c
+            WHERE c.needs_review GROUP BY 2
+            """
+        )
+        conn.execute(
+            f"""
+            INSERT INTO rollups (metric, bucket, key, count)
+            SELECT 'intent', {day}, l.label, count(*)
+            FROM call_labels AS l JOIN call_index AS c ON c.id = l.call_id
+            WHERE l.entry_label
+            GROUP BY 2, 3
+            """
+        )
+        conn.execute(
+            """
+            INSERT INTO rollups (metric, bucket, key, count)
+            SELECT 'obligations_due', due_date, '', count(*) FROM call_obligations GROUP BY 2
+            """
+        )
+        return conn.execute("SELECT count(*) FROM rollups").fetchone()[0]
+
+    def rollups(self, date_from: str, date_to: str) -> dict[str, Any]:
+        """Per-day rollups between two ISO dates (inclusive).
+
+        Reads one row per day, metric and key, so the cost depends on the
+        range, not on the number of calls.
+        """
+        date_from = _iso_date(date_from, "")
+        date_to = _iso_date(date_to, "")
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT metric, bucket, key, count FROM rollups
+                WHERE metric IN ('calls', 'risk', 'needs_review', 'intent', 'obligations_due')
+                    AND bucket BETWEEN ? AND ?
+                """,
+                (date_from, date_to),
+            ).fetchall()
+            backlog = self._conn.execute(
+                "SELECT coalesce(sum(count), 0) FROM rollups WHERE metric = 'needs_review'"
+            ).fetchone()[0]
+
+        days: dict[str, dict[str, Any]] = {}
+        obligations_due: dict[str, int] = {}
+        for metric, bucket, key, count in rows:
+            if metric == "obligations_due":
+                obligations_due[bucket] = count
+                continue
+            day = days.setdefault(
+                bucket, {"date": bucket, "calls": 0, "intents": {}, "risk": {}, "needs_review": 0}
+            )
+            if metric == "calls":
+                day["calls"] = count
+            elif metric == "needs_review":
+                day["needs_review"] = count
+            elif metric == "intent":
+                day["intents"][key] = count
+            elif metric == "risk":
+                day["risk"][key] = count
+
+        for day in days.values():
+            high = day["risk"].get("high", 0)
+            day["high_risk_share"] = high / day["calls"] if day["calls"] else None
+        return {
+            "from": date_from,
+            "to": date_to,
+            "days": [days[bucket] for bucket in sorted(days)],
+            "obligations_due": [
+                {"date": bucket, "count": obligations_due[bucket]}
+                for bucket in sorted(obligations_due)
+            ],
+            "review_backlog": backlog,
+        }
+
+    def reindex(self, batch_size: int = 500) -> int:
+        """Rebuilds the indexes of every stored call; returns how many."""
+        # Oldest first, so calls new to call_index get ids in created_at order.
+        count = 0
+        last: tuple[float, int] = (float("-inf"), 0)
+        while True:
+            with self._lock:
+                rows = self._conn.execute(
+                    """
+                    SELECT rowid, request_id, created_at, document FROM calls
+                    WHERE (created_at, rowid) > (?, ?)
+                    ORDER BY created_at, rowid LIMIT ?
+                    """,
+                    (*last, batch_size),
+                ).fetchall()
+            if not rows:
+                break
+            with self._lock, self._transaction():
+                for _, request_id, created_at, body in rows:
+                    self._index(request_id, created_at, json.loads(body))
+            count += len(rows)
+            last = (rows[-1][2], rows[-1][0])
+        with self._lock:
+            self._conn.execute("ANALYZE")
+        return count
+
+    def search(
+        self,
+        *,
+        text: str | None = None,
+        labels: Iterable[str] = (),
+        risk_level: str | None = None,
+        entity_type: str | None = None,
+        entity_value: str | None = None,
+        due_from: str | None = None,
+        due_to: str | None = None,
+        cursor: int | None = None,
+        limit: int = 50,
+    ) -> tuple[list[dict[str, Any]], int | None]:
+        """Newest-first calls matching every given filter.
+
+        Each index filter yields call ids. A bounded count decides how the
+        query runs. If some filter matches few calls, the query starts from
+        its ids and checks the others per call. If every filter is broad,
+        the query walks calls newest-first on ``created_at`` and checks each
+        filter, so it stops as soon as ``limit`` calls match.
+
+        Calls are ordered by ``call_index.id``, which follows insertion and
+        so ``created_at``. Returns the page and the cursor for the next one.
+        """
+        # (subquery yielding call ids, its id column, params)
+        filters: list[tuple[str, str, list[Any]]] = []
+        if text:
+            filters.append(
+                ("SELECT rowid FROM calls_fts WHERE calls_fts MATCH ?", "rowid", [fts_query(text)])
+            )
+        for label in labels:
+            filters.append(
+                ("SELECT call_id FROM call_labels WHERE label = ?", "call_id", [normalize_label(label)])
+            )
+        if entity_type or entity_value:
+            conditions = []
+            entity_params = []
+            if entity_type:
+                conditions.append("type = ?")
+                entity_params.append(normalize_value(entity_type))
+            if entity_value:
+                conditions.append("value = ?")
+                entity_params.append(normalize_value(entity_value))
+            filters.append(
+                (
+                    "SELECT call_id FROM call_entities WHERE " + " AND ".join(conditions),
+                    "call_id",
+                    entity_params,
+                )
+            )
+        if due_from or due_to:
+            filters.append(
+                (
+                    "SELECT call_id FROM call_obligations WHERE due_date BETWEEN ? AND ?",
+                    "call_id",
+                    [_iso_date(due_from, "0000-01-01"), _iso_date(due_to, "9999-12-31")],
+                )
+            )
+
+        with self._lock:
+            try:
+                driver = self._selective_filter(filters)
+            except sqlite3.OperationalError as exc:
+                raise QueryError(str(exc)) from exc
+
+        # With no selective filter, text search walks FTS matches newest
+        # first (FTS rowids are call ids), so it also stops at ``limit``.
+        if driver is None and text:
+            driver = 0
+        order = "c.id"
+        source = "call_index AS c"
+        clauses: list[str] = []
+        params: list[Any] = []
+        for index, (subquery, column, filter_params) in enumerate(filters):
+            if index == driver and column == "rowid":
+                order = "calls_fts.rowid"
+                source = "calls_fts JOIN call_index AS c ON c.id = calls_fts.rowid"
+                clauses.append("calls_fts MATCH ?")
+            elif index == driver or column == "rowid":
+                # FTS5 re-evaluates the whole MATCH for every rowid probe, so
+                # text that is not driving is evaluated once as a set.
+                clauses.append(f"c.id IN ({subquery})")
+            else:
+                clauses.append(f"EXISTS ({subquery} AND {column} = c.id)")
+            params.extend(filter_params)
+        if risk_level:
+            clauses.append("c.risk_level = ?")
+            params.append(risk_level.lower())
+        if cursor is not None:
+            clauses.append(f"{order} < ?")
+            params.append(cursor)
+
+        where = " AND ".join(clauses) or "1"
+        query = f"""
+            SELECT
+                c.id,
+                c.request_id,
+                c.created_at,
+                c.language_code,
+                c.risk_level,
+                c.primary_intent,
+                (SELECT json_group_array(label) FROM call_labels WHERE call_id = c.id),
+                (
+                    SELECT json_group_array(json_array(due_date, text))
+                    FROM call_obligations WHERE call_id = c.id
+                )
+            FROM {source}
+            WHERE {where}
+            ORDER BY {order} DESC
+            LIMIT ?
+        """
+        with self._lock:
+            try:
+                rows = self._conn.execute(query, [*params, limit]).fetchall()
+            except sqlite3.OperationalError as exc:
+                raise QueryError(str(exc)) from exc
+        calls = [
+            {
+                "request_id": request_id,
+                "created_at": created_at,
+                "language_code": language_code,
+                "risk_level": risk,
+                "primary_intent": primary_intent,
+                "labels": sorted(json.loads(labels_json)),
+                "obligations": [
+                    {"due_date": due, "text": text} for due, text in json.loads(obligations_json)
+                ],
+            }
+            for (
+                _,
+                request_id,
+                created_at,
+                language_code,
+                risk,
+                primary_intent,
+                labels_json,
+                obligations_json,
+            ) in rows
+        ]
+        next_cursor = rows[-1][0] if len(rows) == limit else None
+        return calls, next_cursor
+
+
+def _day(timestamp: float) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).date().isoformat()
+
+
+def _contributions(
+    created_at: float,
+    risk_level: str | None,
+    needs_review: bool,
+    labels: Iterable[str],
+    due_dates: Iterable[str],
+) -> Counter:
+    """What one call adds to each rollup counter."""
+    day = _day(created_at)
+    counts: Counter = Counter({("calls", day, ""): 1})
+    if risk_level:
+        counts[("risk", day, risk_level)] += 1
+    if needs_review:
+        counts[("needs_review", day, "")] += 1
+    for label in labels:
+        counts[("intent", day, label)] += 1
+    for due in due_dates:
+        counts[("obligations_due", due, "")] += 1
+    return counts
+
+
+def _iso_date(value: str | None, default: str) -> str:
+    if not value:
+        return default
+    try:
+        return date.fromisoformat(value).isoformat()
+    except ValueError as exc:
+        raise QueryError(f"invalid date {value!r}; use YYYY-MM-DD") from exc
+
+
+@lru_cache(maxsize=1)
+def get_store() -> ResultStore:
+    return ResultStore(os.getenv("RESULT_STORE_PATH", str(BASE_DIR / "data" / "results.sqlite3")))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the processed-call store.")
+    parser.add_argument("command", choices=["reindex", "rebuild-rollups"])
+    args = parser.parse_args()
+    started = time.perf_counter()
+    if args.command == "reindex":
+        count = get_store().reindex()
+        print(f"reindexed {count} calls in {time.perf_counter() - started:.1f}s")
+    elif args.command == "rebuild-rollups":
+        count = get_store().rebuild_rollups()
+        print(f"rebuilt {count} rollup rows in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
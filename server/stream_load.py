@@ -0,0 +1,159 @@
+"""Load test for the streaming endpoint.
+
+Opens ``--concurrency`` WebSockets to ``--url``. Each one replays one of the
+``--files`` at real-time speed in ``--chunk-ms`` frames, then sends ``stop``
+and waits for ``done``. Reports the server-side latency of each event type,
+backpressure, errors, and how long each stream took to finish after its audio
+ended:
+
+    uv run python serve.py &
+    uv run python stream_load.py -c 16 --files '../web/public/Sample*.mp3'
+
+``--speed 2`` replays twice as fast as real time to exercise backpressure.
+"""
+
+import argparse
+import asyncio
+import glob
+import json
+import shutil
+import statistics
+import subprocess
+import time
+from collections import Counter, defaultdict
+from pathlib import Path
+
+import websockets
+
+
+def duration_seconds(path: Path, fallback_kbps: int) -> float:
+    if shutil.which("ffprobe"):
+        output = subprocess.run(
+            [
+                "ffprobe",
+                "-v",
+                "error",
+                "-show_entries",
+                "format=duration",
+                "-of",
+                "default=noprint_wrappers=1:nokey=1",
+                str(path),
+            ],
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+        try:
+            return float(output)
+        except ValueError:
+            pass
+    return path.stat().st_size * 8 / (fallback_kbps * 1000)
+
+
+async def replay(
+    url: str, path: Path, duration: float, chunk_ms: int, speed: float, language: str | None
+) -> dict:
+    audio = path.read_bytes()
+    chunk_seconds = chunk_ms / 1000
+    chunk_bytes = max(1, int(len(audio) / duration * chunk_seconds))
+    latencies: dict[str, list[int]] = defaultdict(list)
+    counts: Counter[str] = Counter()
+    result: dict = {"file": path.name, "audio_seconds": duration}
+
+    async with websockets.connect(url, max_size=None) as socket:
+        await socket.send(json.dumps({"type": "start", "format": "mp3", "language": language}))
+
+        async def receive() -> None:
+            async for raw in socket:
+                event = json.loads(raw)
+                counts[event["type"]] += 1
+                if "latency_ms" in event:
+                    latencies[event["type"]].append(event["latency_ms"])
+                if event["type"] == "done":
+                    result["request_id"] = event.get("request_id")
+                    return
+
+        receiver = asyncio.create_task(receive())
+        started = time.perf_counter()
+        for index, offset in enumerate(range(0, len(audio), chunk_bytes)):
+            await socket.send(audio[offset : offset + chunk_bytes])
+            # Pace against the start time so send delays don't accumulate.
+            target = started + (index + 1) * chunk_seconds / speed
+            await asyncio.sleep(max(0.0, target - time.perf_counter()))
+        audio_sent = time.perf_counter()
+        await socket.send(json.dumps({"type": "stop"}))
+        await receiver
+
+    result["drain_seconds"] = time.perf_counter() - audio_sent
+    result["counts"] = counts
+    result["latencies"] = latencies
+    return result
+
+
+def _percentiles(values: list[float]) -> str:
+    if not values:
+        return "-"
+    quantiles = statistics.quantiles(values, n=100) if len(values) > 1 else values * 99
+    return f"p50 {quantiles[49]:.0f}  p95 {quantiles[94]:.0f}  p99 {quantiles[98]:.0f}"
+
+
+async def run(args: argparse.Namespace) -> None:
+    files = sorted(Path(path) for path in glob.glob(args.files))
+    if not files:
+        raise SystemExit(f"no files match {args.files}")
+    durations = {path: duration_seconds(path, args.fallback_kbps) for path in files}
+
+    async def one(index: int) -> dict | BaseException:
+        path = files[index % len(files)]
+        # Stagger connections so windows don't all close at the same instant.
+        await asyncio.sleep(index * args.stagger_ms / 1000)
+        try:
+            return await replay(
+                args.url, path, durations[path], args.chunk_ms, args.speed, args.language
+            )
+        except Exception as exc:
+            return exc
+
+    started = time.perf_counter()
+    results = await asyncio.gather(*(one(index) for index in range(args.concurrency)))
+    elapsed = time.perf_counter() - started
+
+    completed = [result for result in results if isinstance(result, dict)]
+    failed = [result for result in results if not isinstance(result, dict)]
+    counts: Counter[str] = Counter()
+    latencies: dict[str, list[int]] = defaultdict(list)
+    for result in completed:
+        counts.update(result["counts"])
+        for kind, values in result["latencies"].items():
+            latencies[kind].extend(values)
+
+    audio = sum(result["audio_seconds"] for result in completed)
+    print(f"streams       {len(results)} ({len(failed)} failed)")
+    print(f"audio         {audio:.0f}s in {elapsed:.0f}s wall")
+    print(f"events        {dict(counts)}")
+    for kind in ("transcript", "translation", "intents"):
+        print(f"{kind:<13} {_percentiles(latencies[kind])} ms after window close")
+    print(f"drain         {_percentiles([r['drain_seconds'] * 1000 for r in completed])} ms")
+    for exc in failed[:5]:
+        print(f"error         {exc!r}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="ws://127.0.0.1:8000/audio/stream")
+    parser.add_argument("--files", default="../web/public/Sample*.mp3")
+    parser.add_argument("-c", "--concurrency", type=int, default=8)
+    parser.add_argument("--chunk-ms", type=int, default=250)
+    parser.add_argument("--speed", type=float, default=1.0)
+    parser.add_argument("--stagger-ms", type=int, default=100)
+    parser.add_argument("--language", help="BCP-47 hint, e.g. ta-IN")
+    parser.add_argument(
+        "--fallback-kbps",
+        type=int,
+        default=128,
+        help="bitrate assumed for durations when ffprobe is not installed",
+    )
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
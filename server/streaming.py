@@ -0,0 +1,403 @@
+"""Rolling-window transcription of a live call over a WebSocket.
+
+Audio frames are buffered per connection and cut into windows of
+``STREAM_WINDOW_SECONDS``. Each window goes through the same routed STT,
+translation and intent stages as an upload, and the results are sent as
+incremental events. A window is flushed when it is long enough, when its
+buffer is full, or when no frame has arrived for the rest of the window.
+
+Each window is diarized on its own, so speaker ids are only consistent
+within a window: ``spk_1`` in one window may be a different person in the
+next. Nothing here reconciles them across window boundaries.
+
+Vendor-bound stages queue for ``scheduler`` slots as interactive work, the
+same as an upload's, and the wait counts toward the stage's budget.
+
+Windows are processed in order by one worker per connection. The queue
+between receiver and worker holds at most ``STREAM_MAX_PENDING_WINDOWS``.
+When it is full the receiver stops reading the socket, so a client that
+sends faster than the pipeline keeps up is slowed down by TCP instead of
+growing server memory.
+"""
+
+import asyncio
+import io
+import json
+import os
+import tempfile
+import time
+import uuid
+import wave
+from dataclasses import dataclass, field
+from typing import Any
+
+from starlette.concurrency import run_in_threadpool
+from starlette.websockets import WebSocket, WebSocketDisconnect
+
+from providers import probe_duration_seconds
+from providers import transcribe as transcribe_audio
+from providers import translate as translate_audio_transcript
+from scheduler import Ticket, scheduler
+from settings import load_env
+from transcript_model import DiarizedEntry, TimestampColumns, Transcript
+
+load_env()
+
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "5"))
+# Caps one window's buffer when a client sends faster than real time.
+STREAM_MAX_BUFFER_BYTES = int(os.getenv("STREAM_MAX_BUFFER_BYTES", str(1024 * 1024)))
+STREAM_MAX_PENDING_WINDOWS = max(1, int(os.getenv("STREAM_MAX_PENDING_WINDOWS", "2")))
+# Per-stage budget for one window; a slower stage is reported as degraded.
+STREAM_STAGE_TIMEOUT_SECONDS = float(os.getenv("STREAM_STAGE_TIMEOUT_SECONDS", "15"))
+
+PCM_FORMAT = "pcm_s16le"
+# Each window is sent to STT as its own file, so only formats that decode
+# from any cut point are accepted: MP3 and ADTS AAC resync on the next frame.
+# Ogg and WebM carry their codec setup once at the start of the stream, so
+# every window after the first would be undecodable.
+SUFFIXES = {"mp3": ".mp3", "aac": ".aac", PCM_FORMAT: ".wav"}
+
+
+class StreamProtocolError(ValueError):
+    pass
+
+
+@dataclass(slots=True)
+class StreamConfig:
+    language: str | None = None
+    format: str = "mp3"
+    sample_rate: int = 16000
+    channels: int = 1
+
+    @classmethod
+    def from_message(cls, message: dict[str, Any]) -> "StreamConfig":
+        config = cls(
+            language=message.get("language"),
+            format=message.get("format", "mp3"),
+            sample_rate=int(message.get("sample_rate", 16000)),
+            channels=int(message.get("channels", 1)),
+        )
+        if config.format not in SUFFIXES:
+            raise StreamProtocolError(f"unsupported format {config.format!r}")
+        return config
+
+    @property
+    def bytes_per_second(self) -> int | None:
+        if self.format != PCM_FORMAT:
+            return None
+        return self.sample_rate * self.channels * 2
+
+
+@dataclass(slots=True)
+class Window:
+    seq: int
+    audio: bytes
+    closed_at: float
+
+
+@dataclass(slots=True)
+class StreamSession:
+    """State of one streaming connection; ``call`` accumulates the whole call."""
+
+    websocket: WebSocket
+    intent_flagger: Any | None = None
+    config: StreamConfig = field(default_factory=StreamConfig)
+    call: Transcript = field(default_factory=Transcript)
+    offset_seconds: float = 0.0
+    windows: int = 0
+    # Last failure per stage, kept on the stored call like an upload's.
+    degraded: dict[str, str] = field(default_factory=dict)
+    words_english: list[str | None] = field(default_factory=list)
+    # Live audio is interactive; the caller completes the ticket.
+    ticket: Ticket = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.ticket = scheduler.admit("interactive")
+        self.call.request_id = f"stream_{uuid.uuid4().hex}"
+        self.call.transcript = ""
+        self.call.entries = []
+        self.call.timestamps = TimestampColumns(
+            words=[], start_time_seconds=[], end_time_seconds=[]
+        )
+
+    async def send(self, event: dict[str, Any]) -> None:
+        await self.websocket.send_text(json.dumps(event, ensure_ascii=False))
+
+    async def run(self) -> Transcript:
+        """Receives audio until ``stop`` or disconnect and returns the call."""
+        queue: asyncio.Queue[Window | None] = asyncio.Queue(STREAM_MAX_PENDING_WINDOWS)
+        worker = asyncio.create_task(self._process(queue))
+        try:
+            await self._receive(queue)
+        finally:
+            await queue.put(None)
+            await worker
+        return self.call
+
+    async def _receive(self, queue: "asyncio.Queue[Window | None]") -> None:
+        buffer = bytearray()
+        window_started: float | None = None
+
+        async def flush() -> None:
+            nonlocal buffer, window_started
+            if not buffer:
+                return
+            window = Window(seq=self.windows, audio=bytes(buffer), closed_at=time.monotonic())
+            self.windows += 1
+            buffer = bytearray()
+            window_started = None
+            if queue.full():
+                await self.send({"type": "backpressure", "pending": queue.qsize()})
+            await queue.put(window)
+
+        while True:
+            timeout = None
+            if window_started is not None:
+                timeout = max(0.0, window_started + STREAM_WINDOW_SECONDS - time.monotonic())
+            try:
+                message = await asyncio.wait_for(self.websocket.receive(), timeout)
+            except asyncio.TimeoutError:
+                await flush()
+                continue
+
+            if message["type"] == "websocket.disconnect":
+                await flush()
+                return
+            if message.get("text") is not None:
+                control = json.loads(message["text"])
+                if control.get("type") == "start":
+                    self.config = StreamConfig.from_message(control)
+                    await self.send({"type": "ready", "request_id": self.call.request_id})
+                elif control.get("type") == "stop":
+                    await flush()
+                    return
+                continue
+
+            chunk = message.get("bytes") or b""
+            if not chunk:
+                continue
+            if window_started is None:
+                window_started = time.monotonic()
+            buffer.extend(chunk)
+
+            # PCM has an exact duration; compressed audio is cut on wall clock,
+            # which matches the audio for a client streaming in real time.
+            per_second = self.config.bytes_per_second
+            if (
+                len(buffer) >= STREAM_MAX_BUFFER_BYTES
+                or (per_second and len(buffer) >= per_second * STREAM_WINDOW_SECONDS)
+                or time.monotonic() - window_started >= STREAM_WINDOW_SECONDS
+            ):
+                await flush()
+
+    async def _process(self, queue: "asyncio.Queue[Window | None]") -> None:
+        while (window := await queue.get()) is not None:
+            try:
+                await self._process_window(window)
+            except WebSocketDisconnect:
+                # Keep draining so the receiver is never blocked on a dead socket.
+                continue
+            except Exception as exc:
+                print(f"[stream] window {window.seq} failed: {exc}")
+                try:
+                    await self.send({"type": "error", "seq": window.seq, "detail": str(exc)})
+                except Exception:
+                    pass
+
+    def _write_window(self, window: Window) -> tuple[str, float | None]:
+        suffix = SUFFIXES[self.config.format]
+        with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as temp_file:
+            if self.config.format == PCM_FORMAT:
+                wav = io.BytesIO()
+                with wave.open(wav, "wb") as writer:
+                    writer.setnchannels(self.config.channels)
+                    writer.setsampwidth(2)
+                    writer.setframerate(self.config.sample_rate)
+                    writer.writeframes(window.audio)
+                temp_file.write(wav.getvalue())
+                duration = len(window.audio) / self.config.bytes_per_second
+            else:
+                temp_file.write(window.audio)
+                duration = None
+        if duration is None:
+            duration = probe_duration_seconds(temp_file.name)
+        return temp_file.name, duration
+
+    def _latency_ms(self, window: Window) -> int:
+        return round((time.monotonic() - window.closed_at) * 1000)
+
+    async def _scheduled(self, stage: str, fn: Any, *args: Any) -> Any:
+        async with scheduler.stage(self.ticket, f"stream_{stage}"):
+            return await fn(*args)
+
+    async def _stage(self, window: Window, stage: str, fn: Any, *args: Any) -> Any:
+        """Runs one stage within the per-window budget; None means degraded."""
+        try:
+            return await asyncio.wait_for(
+                self._scheduled(stage, fn, *args), STREAM_STAGE_TIMEOUT_SECONDS
+            )
+        except asyncio.TimeoutError:
+            reason = f"{stage} exceeded {STREAM_STAGE_TIMEOUT_SECONDS}s"
+        except Exception as exc:
+            reason = str(exc)
+        self.degraded[stage] = f"window {window.seq}: {reason}"
+        await self.send({"type": "degraded", "seq": window.seq, "stage": stage, "reason": reason})
+        return None
+
+    async def _process_window(self, window: Window) -> None:
+        path, duration = await run_in_threadpool(self._write_window, window)
+        try:
+            transcribed = await self._stage(
+                window,
+                "transcript",
+                run_in_threadpool,
+                transcribe_audio,
+                path,
+                self.config.language or self.call.language_code,
+            )
+        finally:
+            os.remove(path)
+
+        offset = self.offset_seconds
+        if transcribed is not None:
+            output, stt_provider = transcribed
+            piece = Transcript.from_dict(output)
+            if duration is None:
+                duration = max(
+                    (entry.end_time_seconds or 0.0 for entry in piece.entries or []),
+                    default=STREAM_WINDOW_SECONDS,
+                )
+        self.offset_seconds += duration or STREAM_WINDOW_SECONDS
+        if transcribed is None or not piece.entries:
+            return
+
+        first = len(self.call.entries)
+        first_word = len(self.words_english)
+        new_indices = self._append(piece, offset)
+        await self.send(
+            {
+                "type": "transcript",
+                "seq": window.seq,
+                "start": round(offset, 3),
+                "end": round(self.offset_seconds, 3),
+                "language_code": self.call.language_code,
+                "provider": stt_provider,
+                "entries": [
+                    {"index": index, **self.call.entries[index].to_dict()}
+                    for index in new_indices
+                ],
+                "latency_ms": self._latency_ms(window),
+            }
+        )
+
+        # Translate only this window; the call-level text is composed from
+        # the windows at the end.
+        translated = await self._stage(
+            window,
+            "translation",
+            run_in_threadpool,
+            translate_audio_transcript,
+            piece,
+            self.call.language_code or "unknown",
+        )
+        if translated is not None:
+            piece = translated[0]
+            for index, entry in zip(new_indices, piece.entries):
+                self.call.entries[index].transcript_english = entry.transcript_english
+            if piece.timestamps is not None and piece.timestamps.words_english is not None:
+                words_english = piece.timestamps.words_english
+                self.words_english[first_word : first_word + len(words_english)] = words_english
+            await self.send(
+                {
+                    "type": "translation",
+                    "seq": window.seq,
+                    "provider": translated[1],
+                    "entries": [
+                        {
+                            "index": index,
+                            "transcript_english": self.call.entries[index].transcript_english,
+                        }
+                        for index in new_indices
+                    ],
+                    "latency_ms": self._latency_ms(window),
+                }
+            )
+
+        if self.intent_flagger is None:
+            return
+        # Earlier windows stay in the call, so batches still see the
+        # preceding turns as context.
+        classified = await self._stage(window, "intents", self._classify, first)
+        if classified is not None:
+            await self.send(
+                {
+                    "type": "intents",
+                    "seq": window.seq,
+                    "entries": [
+                        {
+                            "index": index,
+                            "intent_classification": self.call.entries[index].intent_classification,
+                        }
+                        for index in new_indices
+                    ],
+                    "latency_ms": self._latency_ms(window),
+                }
+            )
+
+    async def _classify(self, first: int) -> bool:
+        await self.intent_flagger.classify_transcript(
+            self.call, range(first, len(self.call.entries))
+        )
+        return True
+
+    def _append(self, piece: Transcript, offset: float) -> list[int]:
+        call = self.call
+        call.language_code = call.language_code or piece.language_code
+        call.language_probability = call.language_probability or piece.language_probability
+        call.transcript = " ".join(filter(None, [call.transcript, piece.transcript]))
+
+        if piece.timestamps is not None:
+            columns = call.timestamps
+            columns.words.extend(piece.timestamps.words)
+            self.words_english.extend([None] * len(piece.timestamps.words))
+            for target, source in (
+                (columns.start_time_seconds, piece.timestamps.start_time_seconds),
+                (columns.end_time_seconds, piece.timestamps.end_time_seconds),
+            ):
+                target.extend(_shifted(value, offset) for value in source)
+
+        new_indices: list[int] = []
+        for entry in piece.entries or []:
+            new_indices.append(len(call.entries))
+            call.entries.append(
+                DiarizedEntry(
+                    transcript=entry.transcript,
+                    start_time_seconds=_shifted(entry.start_time_seconds, offset),
+                    end_time_seconds=_shifted(entry.end_time_seconds, offset),
+                    speaker_id=entry.speaker_id,
+                    extra=entry.extra,
+                )
+            )
+        return new_indices
+
+    def finish(self) -> Transcript:
+        """Composes call-level English and word translations from the windows."""
+        call = self.call
+        entries = call.entries or []
+        # A window whose translation degraded leaves gaps; better no
+        # call-level English than a silently partial one.
+        if entries and all(entry.transcript_english is not None for entry in entries):
+            call.transcript_english = " ".join(
+                entry.transcript_english for entry in entries if entry.transcript_english
+            )
+        if self.words_english and None not in self.words_english:
+            call.timestamps.words_english = list(self.words_english)
+        call.metrics["stream"] = {
+            "windows": self.windows,
+            "duration_seconds": round(self.offset_seconds, 3),
+        }
+        return call
+
+
+def _shifted(value: float | None, offset: float) -> float | None:
+    return None if value is None else value + offset
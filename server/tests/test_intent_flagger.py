@@ -0,0 +1,116 @@
+from importlib.util import module_from_spec, spec_from_file_location
+from pathlib import Path
+
+import pytest
+
+from transcript_model import DiarizedEntry, Transcript
+
+_spec = spec_from_file_location(
+    "intent_flagger", Path(__file__).resolve().parents[1] / "intent-flagger.py"
+)
+intent_flagger = module_from_spec(_spec)
+_spec.loader.exec_module(intent_flagger)
+
+
+@pytest.fixture
+def prompts(monkeypatch):
+    """Answers every batch prompt with NO_COMMITMENT and records the prompts."""
+    sent: list[str] = []
+
+    async def ask(prompt, assistant_id):
+        sent.append(prompt)
+        indices = [
+            int(line.split("]")[0].strip("[ "))
+            for line in prompt.splitlines()
+            if "(CLASSIFY)" in line
+        ]
+        return intent_flagger.json.dumps(
+            [{"index": index, "label": "NO_COMMITMENT", "reason": "test"} for index in indices]
+        )
+
+    monkeypatch.setattr(intent_flagger, "_ask", ask)
+    return sent
+
+
+def make_entries(count):
+    return [DiarizedEntry(transcript=f"line {index}", speaker_id="spk_1") for index in range(count)]
+
+
+@pytest.mark.parametrize("indices", [[5, 150, 295], list(range(3, 59, 7))])
+def test_scattered_escalations_share_one_request(prompts, indices):
+    entries = make_entries(300)
+
+    results, failures = intent_flagger.asyncio.run(
+        intent_flagger.classify_escalated(entries, indices, "assistant")
+    )
+
+    assert len(prompts) == 1
+    assert sorted(results) == indices
+    assert failures == {}
+    expected = intent_flagger._context_indices(indices, len(entries))
+    prompt_indices = [
+        int(line.strip().split("]")[0][1:])
+        for line in prompts[0].splitlines()
+        if line.startswith("[")
+    ]
+    assert prompt_indices == expected
+
+
+def test_gap_marker_separates_non_adjacent_runs(prompts):
+    entries = make_entries(300)
+
+    intent_flagger.asyncio.run(intent_flagger.classify_escalated(entries, [5, 150], "assistant"))
+
+    lines = [line for line in prompts[0].splitlines() if line.startswith(("[", "..."))]
+    assert lines[5] == "..."
+    assert lines.count("...") == 1
+
+
+def test_batches_are_capped_at_batch_size(prompts):
+    entries = make_entries(300)
+    indices = list(range(0, 300, 10))
+
+    intent_flagger.asyncio.run(intent_flagger.classify_escalated(entries, indices, "assistant"))
+
+    assert len(prompts) == -(-len(indices) // intent_flagger.BATCH_SIZE)
+
+
+def test_vendor_error_keeps_local_labels_without_per_entry_retries(monkeypatch):
+    calls = []
+
+    async def ask(prompt, assistant_id):
+        calls.append(prompt)
+        raise RuntimeError("backboard is down")
+
+    async def assistant_id():
+        return "assistant"
+
+    monkeypatch.setattr(intent_flagger, "_ask", ask)
+    monkeypatch.setattr(intent_flagger, "get_assistant_id", assistant_id)
+    monkeypatch.setattr(intent_flagger, "local_threshold", lambda: 1.1)
+    transcript = Transcript(entries=[DiarizedEntry(transcript="Why was I charged a bounce fee?")])
+    local = intent_flagger.get_local_classifier().predict("Why was I charged a bounce fee?")
+
+    intent_flagger.asyncio.run(intent_flagger.classify_transcript(transcript))
+
+    result = transcript.entries[0].intent_classification
+    assert len(calls) == 1
+    assert result["label"] == local.label
+    assert result["source"] == "local"
+    assert result["degraded"] is True
+    assert result["degraded_reason"] == "backboard is down"
+
+
+def test_invalid_single_reply_is_degraded_not_llm(monkeypatch):
+    async def ask(prompt, assistant_id):
+        return '{"label": "MAYBE"}'
+
+    monkeypatch.setattr(intent_flagger, "_ask", ask)
+    monkeypatch.setattr(intent_flagger, "BATCH_SIZE", 1)
+
+    results, failures = intent_flagger.asyncio.run(
+        intent_flagger.classify_escalated(make_entries(1), [0], "assistant")
+    )
+
+    assert results == {}
+    assert "no valid label" in failures[0]
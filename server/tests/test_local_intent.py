@@ -0,0 +1,70 @@
+import json
+
+import pytest
+
+from intent_eval import load_labelled
+from local_intent import (
+    DEFAULT_THRESHOLD,
+    UNCALIBRATED_MODEL_DISCOUNT,
+    Calibration,
+    LocalIntentClassifier,
+)
+
+
+def test_rule_and_model_disagreement_falls_below_threshold():
+    prediction = LocalIntentClassifier().raw_predict("Why was I charged a bounce fee?")
+
+    assert prediction.reason == "Rule and model disagree"
+    assert prediction.confidence < DEFAULT_THRESHOLD
+
+
+def test_rule_and_model_agreement_keeps_confidence():
+    prediction = LocalIntentClassifier().raw_predict("What is my EMI amount?")
+
+    assert prediction.label == "INFORMATION_SEEKING"
+    assert prediction.source == "rule+model"
+    assert prediction.confidence >= DEFAULT_THRESHOLD
+
+
+def test_discount_applies_only_without_calibration():
+    classifier = LocalIntentClassifier()
+    raw = classifier.raw_predict("okay let me think")
+
+    assert raw.source == "model"
+    assert classifier.predict("okay let me think").confidence == pytest.approx(
+        raw.confidence * UNCALIBRATED_MODEL_DISCOUNT
+    )
+
+    # Bins are fitted on raw_predict scores, so they must see the same scale.
+    classifier.calibration = Calibration([raw.confidence + 1e-9], [0.1, 0.9])
+    assert classifier.raw_predict("okay let me think").confidence == raw.confidence
+    assert classifier.predict("okay let me think").confidence == 0.1
+
+
+def test_eval_skips_failed_llm_results(tmp_path):
+    path = tmp_path / "call_flagged.json"
+    path.write_text(
+        json.dumps(
+            [
+                {"transcript": "a", "intent_classification": {"label": "REFUSAL", "source": "llm"}},
+                {
+                    "transcript": "b",
+                    "intent_classification": {
+                        "label": "NO_COMMITMENT",
+                        "reason": "Classification error: timed out",
+                        "source": "llm",
+                    },
+                },
+                {
+                    "transcript": "c",
+                    "intent_classification": {
+                        "label": "DISPUTE",
+                        "source": "local",
+                        "degraded": True,
+                    },
+                },
+            ]
+        )
+    )
+
+    assert load_labelled([str(path)]) == [("a", "REFUSAL")]
@@ -0,0 +1,34 @@
+import sqlite3
+
+import pytest
+
+import main
+from store import StaleWriteError
+from transcript_model import Transcript
+
+
+class FailingStore:
+    def __init__(self, error):
+        self.error = error
+
+    def save(self, request_id, document, *, expected_updated_at=None):
+        raise self.error
+
+
+def test_failed_store_write_degrades_instead_of_raising(monkeypatch):
+    error = sqlite3.OperationalError("database is locked")
+    monkeypatch.setattr(main, "get_store", lambda: FailingStore(error))
+    degraded: dict[str, str] = {}
+
+    main.save_result(Transcript(request_id="a"), {}, intents_ran=False, degraded=degraded)
+
+    assert degraded == {"store": "database is locked"}
+
+
+def test_stale_write_is_raised(monkeypatch):
+    monkeypatch.setattr(main, "get_store", lambda: FailingStore(StaleWriteError("changed")))
+
+    with pytest.raises(StaleWriteError):
+        main.save_result(
+            Transcript(request_id="a"), {}, intents_ran=False, degraded={}, expected_updated_at=1.0
+        )
@@ -0,0 +1,60 @@
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+import pytest
+
+import profiling
+from profiling import RequestProfile, bind_stage, start_profile
+
+REQUESTED = SimpleNamespace(headers={"x-profile": "1"}, query_params={})
+
+
+@pytest.fixture(autouse=True)
+def enabled(tmp_path, monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILE_TOKEN", None)
+    monkeypatch.setattr(profiling, "PROFILE_DIR", str(tmp_path))
+
+
+def test_bind_stage_registers_other_threads_under_the_stage():
+    profile = start_profile(REQUESTED)
+    assert isinstance(profile, RequestProfile)
+    seen: dict[int, str] = {}
+
+    def vendor_call() -> None:
+        seen.update(profile.threads)
+        seen["ident"] = threading.get_ident()
+
+    def stage_body() -> None:
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pool.submit(bind_stage(vendor_call)).result()
+
+    try:
+        asyncio.run(profile.run_in_threadpool("translation", stage_body))
+    finally:
+        profile.finish()
+
+    assert seen[seen["ident"]] == "translation"
+    assert bind_stage(vendor_call) is vendor_call
+
+
+def test_concurrent_starts_never_exceed_the_limit(monkeypatch):
+    monkeypatch.setattr(profiling, "PROFILE_MAX_CONCURRENT", 2)
+    monkeypatch.setattr(profiling, "PROFILE_TRACEMALLOC", False)
+    barrier = threading.Barrier(16)
+
+    def start():
+        barrier.wait()
+        return start_profile(REQUESTED)
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        profiles = list(pool.map(lambda _: start(), range(16)))
+
+    started = [profile for profile in profiles if isinstance(profile, RequestProfile)]
+    try:
+        assert len(started) == 2
+    finally:
+        for profile in started:
+            profile.finish()
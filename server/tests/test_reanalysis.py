@@ -0,0 +1,133 @@
+import pytest
+
+import reanalysis
+from reanalysis import EditRequest, apply_edits, retranslate
+from transcript_model import DiarizedEntry, TimestampColumns, Transcript
+
+
+@pytest.fixture(autouse=True)
+def fake_translate(monkeypatch):
+    """Translates "x" to "EN[x]" and records every text sent."""
+    sent: list[str] = []
+
+    def translate(transcript: Transcript, source_lang: str) -> tuple[Transcript, str]:
+        calls = 0
+        for entry in transcript.entries or []:
+            sent.append(entry.transcript)
+            entry.transcript_english = f"EN[{entry.transcript}]"
+            calls += 1
+        if transcript.transcript is not None and not transcript.entries:
+            sent.append(transcript.transcript)
+            transcript.transcript_english = f"EN[{transcript.transcript}]"
+            calls += 1
+        transcript.metrics["translation"] = {
+            "chars_translated": sum(map(len, sent)),
+            "calls": calls,
+        }
+        return transcript, "fake"
+
+    monkeypatch.setattr(reanalysis, "translate_with_router", translate)
+    return sent
+
+
+def make_call() -> Transcript:
+    words = ["ಈಗ ಹಣ", "ಕಳುಹಿಸುತ್ತೇನೆ", "ನಾಳೆ ಬನ್ನಿ"]
+    return Transcript(
+        transcript=" ".join(words),
+        timestamps=TimestampColumns(
+            words=list(words),
+            start_time_seconds=[0.0, 1.0, 2.0],
+            end_time_seconds=[1.0, 2.0, 3.0],
+            words_english=[f"EN[{word}]" for word in words],
+        ),
+        entries=[
+            DiarizedEntry(
+                transcript="ಈಗ ಹಣ ಕಳುಹಿಸುತ್ತೇನೆ",
+                transcript_english="EN[ಈಗ ಹಣ] EN[ಕಳುಹಿಸುತ್ತೇನೆ]",
+            ),
+            DiarizedEntry(transcript="ನಾಳೆ ಬನ್ನಿ", transcript_english="EN[ನಾಳೆ ಬನ್ನಿ]"),
+        ],
+        language_code="kn-IN",
+    )
+
+
+def test_span_edit_remaps_to_touched_word_and_entry(fake_translate):
+    call = make_call()
+    start = call.transcript.index("ಕಳುಹಿಸುತ್ತೇನೆ")
+    end = start + len("ಕಳುಹಿಸುತ್ತೇನೆ")
+    edit = {"start": start, "end": end, "text": "ಕೊಡುತ್ತೇನೆ"}
+    plan = apply_edits(call, EditRequest(spans=[edit]))
+
+    assert plan.retranslate_words == {1}
+    assert plan.retranslate_entries == {0}
+    assert call.transcript == "ಈಗ ಹಣ ಕೊಡುತ್ತೇನೆ ನಾಳೆ ಬನ್ನಿ"
+    assert call.entries[0].transcript == "ಈಗ ಹಣ ಕೊಡುತ್ತೇನೆ"
+
+    retranslate(call, plan, "kn-IN")
+
+    # Only the edited word goes to the translator; the entry is composed from words.
+    assert fake_translate == ["ಕೊಡುತ್ತೇನೆ"]
+    assert call.timestamps.words_english == ["EN[ಈಗ ಹಣ]", "EN[ಕೊಡುತ್ತೇನೆ]", "EN[ನಾಳೆ ಬನ್ನಿ]"]
+    assert call.entries[0].transcript_english == "EN[ಈಗ ಹಣ] EN[ಕೊಡುತ್ತೇನೆ]"
+    assert call.transcript_english == "EN[ಈಗ ಹಣ] EN[ಕೊಡುತ್ತೇನೆ] EN[ನಾಳೆ ಬನ್ನಿ]"
+
+
+def test_insertion_at_span_start_belongs_to_that_span():
+    call = make_call()
+    start = call.transcript.index("ನಾಳೆ")
+    plan = apply_edits(call, EditRequest(spans=[{"start": start, "end": start, "text": "ಸರಿ "}]))
+
+    assert plan.retranslate_words == {2}
+    assert plan.retranslate_entries == {1}
+    assert call.timestamps.words[2] == "ಸರಿ ನಾಳೆ ಬನ್ನಿ"
+    assert call.entries[1].transcript == "ಸರಿ ನಾಳೆ ಬನ್ನಿ"
+
+
+def test_english_override_reaches_transcript_english(fake_translate):
+    call = make_call()
+    plan = apply_edits(
+        call, EditRequest(entries=[{"index": 0, "transcript_english": "REVIEWER FIX now"}])
+    )
+    assert plan.english_overrides == {0}
+    assert plan.reclassify == {0}
+
+    retranslate(call, plan, "kn-IN")
+
+    assert fake_translate == []
+    assert call.entries[0].transcript_english == "REVIEWER FIX now"
+    assert call.transcript_english == "REVIEWER FIX now EN[ನಾಳೆ ಬನ್ನಿ]"
+    # The words the entry is made of carry the correction too, so a later
+    # edit that composes from words keeps it.
+    assert call.timestamps.words_english == ["REVIEWER", "FIX now", "EN[ನಾಳೆ ಬನ್ನಿ]"]
+
+    start = call.transcript.index("ನಾಳೆ")
+    end = start + len("ನಾಳೆ")
+    later = apply_edits(call, EditRequest(spans=[{"start": start, "end": end, "text": "ಇಂದು"}]))
+    retranslate(call, later, "kn-IN")
+    assert call.transcript_english == "REVIEWER FIX now EN[ಇಂದು ಬನ್ನಿ]"
+
+
+def test_override_wins_over_source_edit_of_same_entry(fake_translate):
+    call = make_call()
+    plan = apply_edits(
+        call,
+        EditRequest(
+            entries=[{"index": 1, "transcript": "ನಾಳೆ ಬಾ", "transcript_english": "come tomorrow"}]
+        ),
+    )
+    retranslate(call, plan, "kn-IN")
+
+    assert call.entries[1].transcript == "ನಾಳೆ ಬಾ"
+    assert call.entries[1].transcript_english == "come tomorrow"
+    assert call.transcript_english.endswith("come tomorrow")
+
+
+def test_overlapping_edits_are_rejected():
+    call = make_call()
+    with pytest.raises(reanalysis.EditError):
+        apply_edits(
+            call,
+            EditRequest(
+                spans=[{"start": 0, "end": 4, "text": "a"}, {"start": 2, "end": 6, "text": "b"}]
+            ),
+        )
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from scheduler import Scheduler, SchedulerShed
+
+
+def run_queued(scheduler, jobs):
+    """Holds the only slot while `jobs` queue, then returns the order they ran in.
+
+    Each job is (name, priority, deadline_ms).
+    """
+
+    async def main():
+        order = []
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.stage(scheduler.admit("interactive"), "hold"):
+                await release.wait()
+
+        async def job(name, priority, deadline_ms):
+            async with scheduler.stage(scheduler.admit(priority, deadline_ms), "work"):
+                order.append(name)
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        tasks = [asyncio.create_task(job(*spec)) for spec in jobs]
+        await asyncio.sleep(0)
+        release.set()
+        await asyncio.gather(holder, *tasks)
+        return order
+
+    return asyncio.run(main())
+
+
+def test_classes_share_slots_by_weight():
+    scheduler = Scheduler(1, {"interactive": 4.0, "batch": 1.0})
+    jobs = [(f"b{i}", "batch", None) for i in range(10)]
+    jobs += [(f"i{i}", "interactive", None) for i in range(10)]
+
+    order = run_queued(scheduler, jobs)
+
+    classes = "".join(name[0] for name in order)
+    # Batch is queued first but gets one slot in every five while both wait.
+    assert classes[:10].count("b") == 2
+    assert classes[:10].count("i") == 8
+    # Within a class, equal deadlines run in arrival order.
+    assert [name for name in order if name[0] == "b"] == [f"b{i}" for i in range(10)]
+
+
+def test_earliest_deadline_first_within_class():
+    scheduler = Scheduler(1, {"interactive": 1.0})
+    jobs = [
+        ("none", "interactive", None),
+        ("late", "interactive", 60_000),
+        ("soon", "interactive", 20_000),
+        ("middle", "interactive", 40_000),
+    ]
+
+    assert run_queued(scheduler, jobs) == ["soon", "middle", "late", "none"]
+
+
+def test_expired_deadline_is_shed_while_queued_and_frees_nothing():
+    scheduler = Scheduler(1, {"interactive": 1.0})
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            async with scheduler.stage(scheduler.admit("interactive"), "hold"):
+                await release.wait()
+
+        holder = asyncio.create_task(hold())
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerShed, match="deadline passed while queued"):
+            async with scheduler.stage(scheduler.admit("interactive", 20), "work"):
+                pass
+        release.set()
+        await holder
+
+        # A deadline that has already passed is shed before it queues.
+        ticket = scheduler.admit("interactive", 1)
+        await asyncio.sleep(0.01)
+        with pytest.raises(SchedulerShed, match="cannot finish before its deadline"):
+            async with scheduler.stage(ticket, "work"):
+                pass
+
+        # The shed waiters gave up no slot they didn't hold.
+        async with scheduler.stage(scheduler.admit("interactive"), "work"):
+            assert scheduler.running == 1
+        assert scheduler.running == 0
+
+    asyncio.run(main())
+    assert scheduler.stats["interactive"].shed == 2
+    assert scheduler.stats["interactive"].queued == 0
@@ -0,0 +1,114 @@
+import threading
+from datetime import date
+
+import pytest
+
+from store import ResultStore, StaleWriteError, normalize_due_date
+
+MONDAY = date(2026, 10, 19)
+
+
+@pytest.mark.parametrize(
+    ("text", "expected"),
+    [
+        ("2026-11-02", "2026-11-02"),
+        ("today", "2026-10-19"),
+        ("by tomorrow", "2026-10-20"),
+        ("by Friday", "2026-10-23"),
+        ("this Friday", "2026-10-23"),
+        ("next Friday", "2026-10-30"),
+        ("next week Friday", "2026-10-30"),
+        ("by Friday next week", "2026-10-30"),
+        ("next week", "2026-10-26"),
+        ("next month", "2026-11-01"),
+        ("5th of next month", "2026-11-05"),
+        ("the 5th", "2026-11-05"),
+        ("by the 25th", "2026-10-25"),
+        ("31st of next month", None),
+        ("end of next week", None),
+        ("within 5 days", None),
+        ("", None),
+    ],
+)
+def test_normalize_due_date(text, expected):
+    assert normalize_due_date(text, MONDAY) == expected
+
+
+def _document(labels, primary_intent=None):
+    return {
+        "transcript": "text",
+        "diarized_transcript": {
+            "entries": [
+                {"transcript": "x", "intent_classification": {"label": label}} for label in labels
+            ]
+        },
+        "insights": {"primary_intent": primary_intent, "secondary_intents": ["asked about fees"]},
+    }
+
+
+def test_intent_rollup_counts_only_utterance_labels(tmp_path):
+    store = ResultStore(tmp_path / "results.sqlite3")
+    store.save("a", _document(["AGREEMENT", "AGREEMENT"], primary_intent="promise to pay"))
+    store.save("b", _document(["DISPUTE"], primary_intent="dispute"))
+    # Re-saving replaces the call's contribution.
+    store.save("a", _document(["DELAY_REQUEST"]))
+
+    today = date.today().isoformat()
+    (day,) = store.rollups(today, today)["days"]
+    assert day["intents"] == {"DELAY_REQUEST": 1, "DISPUTE": 1}
+    store.rebuild_rollups()
+    assert store.rollups(today, today)["days"] == [day]
+    # Free-text insights intents stay searchable.
+    calls, _ = store.search(labels=["asked about fees"])
+    assert [call["request_id"] for call in calls] == ["b", "a"]
+
+
+def test_concurrent_migration_of_an_old_store(tmp_path):
+    path = tmp_path / "results.sqlite3"
+    store = ResultStore(path)
+    store.save("a", _document(["AGREEMENT"], primary_intent="agreement"))
+    store._conn.executescript(
+        """
+        ALTER TABLE call_index DROP COLUMN needs_review;
+        CREATE TABLE old_labels (label TEXT NOT NULL, call_id INTEGER NOT NULL,
+            PRIMARY KEY (label, call_id)) WITHOUT ROWID;
+        INSERT INTO old_labels SELECT label, call_id FROM call_labels;
+        DROP TABLE call_labels;
+        ALTER TABLE old_labels RENAME TO call_labels;
+        """
+    )
+    store._conn.close()
+
+    errors = []
+
+    def open_store():
+        try:
+            ResultStore(path)
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=open_store) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    today = date.today().isoformat()
+    (day,) = ResultStore(path).rollups(today, today)["days"]
+    assert day["intents"] == {"AGREEMENT": 1}
+
+
+def test_save_rejects_stale_version(tmp_path):
+    store = ResultStore(tmp_path / "calls.db")
+    store.save("a", _document(["AGREEMENT"]))
+    _, version = store.load_versioned("a")
+
+    store.save("a", _document(["DISPUTE"]), expected_updated_at=version)
+    with pytest.raises(StaleWriteError):
+        store.save("a", _document(["REFUSAL"]), expected_updated_at=version)
+
+    document, _ = store.load_versioned("a")
+    entries = document["diarized_transcript"]["entries"]
+    labels = [entry["intent_classification"]["label"] for entry in entries]
+    assert labels == ["DISPUTE"]
@@ -0,0 +1,26 @@
+from transcript_model import Transcript
+
+
+def test_null_known_keys_round_trip():
+    data = {
+        "request_id": None,
+        "transcript": "hello",
+        "timestamps": None,
+        "diarized_transcript": None,
+        "language_code": "kn-IN",
+        "language_probability": None,
+    }
+
+    assert Transcript.from_dict(data).to_dict() == data
+
+
+def test_absent_keys_stay_absent_and_set_values_replace_nulls():
+    transcript = Transcript.from_dict({"transcript": "hello", "request_id": None})
+    transcript.request_id = "abc"
+    transcript.transcript_english = "hello"
+
+    assert transcript.to_dict() == {
+        "request_id": "abc",
+        "transcript": "hello",
+        "transcript_english": "hello",
+    }
@@ -0,0 +1,86 @@
+import pytest
+
+import translator
+from transcript_model import DiarizedEntry, TimestampColumns, Transcript
+
+
+@pytest.fixture(autouse=True)
+def sent(monkeypatch):
+    """Translates "x" to "EN[x]" and records every text sent to the vendor."""
+    texts: list[str] = []
+
+    def translate_text(client, text, source_lang, target_lang="en-IN"):
+        texts.append(text)
+        return f"EN[{text}]"
+
+    monkeypatch.setattr(translator, "get_client", lambda: None)
+    monkeypatch.setattr(translator, "translate_text", translate_text)
+    return texts
+
+
+def make_transcript(text, words, entries):
+    return Transcript(
+        transcript=text,
+        language_code="kn-IN",
+        timestamps=TimestampColumns(
+            words=list(words),
+            start_time_seconds=[float(i) for i in range(len(words))],
+            end_time_seconds=[float(i + 1) for i in range(len(words))],
+        ),
+        entries=[DiarizedEntry(transcript=entry) for entry in entries],
+    )
+
+
+def test_locate_spans_never_goes_backwards():
+    assert translator.locate_spans("a b a", ["a", "b", "a", "c", ""]) == [
+        (0, 1),
+        (2, 3),
+        (4, 5),
+        None,
+        None,
+    ]
+
+
+def test_unaligned_entry_falls_back_to_whole_entry_translation(sent):
+    transcript = make_transcript("a b", ["a", "b"], ["a b", "not in the transcript"])
+
+    translator.translate_transcript(transcript)
+
+    first, second = transcript.entries
+    assert first.transcript_english == "EN[a] EN[b]"
+    assert second.transcript_english == "EN[not in the transcript]"
+    assert "not in the transcript" in sent
+    assert transcript.metrics["translation"]["unaligned_spans"] == 1
+
+
+def test_word_chunk_crossing_entry_boundary_is_split_into_atoms(sent):
+    transcript = make_transcript("a b c d", ["a", "b c", "d"], ["a b", "c d"])
+
+    translator.translate_transcript(transcript)
+
+    assert sorted(sent) == ["a", "b", "c", "d"]
+    assert transcript.timestamps.words_english == ["EN[a]", "EN[b] EN[c]", "EN[d]"]
+    assert [entry.transcript_english for entry in transcript.entries] == [
+        "EN[a] EN[b]",
+        "EN[c] EN[d]",
+    ]
+    assert transcript.transcript_english == "EN[a] EN[b] EN[c] EN[d]"
+
+
+def test_cached_atoms_compose_the_same_text_as_a_cold_run(sent):
+    warm = make_transcript("x y x y", ["x", "y", "x", "y"], ["x y", "x y"])
+
+    translator.translate_transcript(warm)
+
+    metrics = warm.metrics["translation"]
+    assert metrics["spans"] == 4
+    assert metrics["calls"] == 2
+    assert sent == ["x", "y"]
+
+    # The second entry was composed from cache hits; translated on its own,
+    # with an empty cache, it must come out identical.
+    cold = make_transcript("x y", ["x", "y"], ["x y"])
+    translator.translate_transcript(cold)
+
+    assert warm.entries[1].transcript_english == cold.entries[0].transcript_english
+    assert warm.timestamps.words_english[2:] == cold.timestamps.words_english
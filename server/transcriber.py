@@ -2,23 +2,40 @@ import json
 import os
 import shutil
 import tempfile
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from dotenv import load_dotenv
-from sarvamai import SarvamAI
+from resilience import call_vendor
+from settings import load_env
 
-BASE_DIR = Path(__file__).resolve().parent
-load_dotenv(BASE_DIR / ".env")
+if TYPE_CHECKING:
+    from sarvamai import SarvamAI
 
+load_env()
+
+
+@lru_cache(maxsize=1)
+def get_client() -> "SarvamAI":
+    from sarvamai import SarvamAI
 
-def get_client() -> SarvamAI:
     api_key = os.getenv("SARVAM_API_KEY")
     if not api_key:
         raise RuntimeError("SARVAM_API_KEY is not set")
     return SarvamAI(api_subscription_key=api_key)
 
 
+def _run_job(client: "SarvamAI", audio_path: str, create_job_kwargs: dict[str, Any]) -> Any:
+    job = client.speech_to_text_job.create_job(**create_job_kwargs)
+    job.upload_files(file_paths=[audio_path])
+    job.start()
+    job.wait_until_complete()
+
+    if job.is_failed():
+        raise RuntimeError("Speech-to-text job failed")
+    return job
+
+
 def transcribe_audio_file(
     audio_path: str,
     *,
@@ -39,13 +56,8 @@ def transcribe_audio_file(
     if num_speakers is not None:
         create_job_kwargs["num_speakers"] = num_speakers
 
-    job = client.speech_to_text_job.create_job(**create_job_kwargs)
-    job.upload_files(file_paths=[audio_path])
-    job.start()
-    job.wait_until_complete()
-
-    if job.is_failed():
-        raise RuntimeError("Speech-to-text job failed")
+    # Job creation is not idempotent, so the breaker applies but no hedging.
+    job = call_vendor("sarvam", "sarvam.stt", _run_job, client, audio_path, create_job_kwargs)
 
     output_dir = Path(tempfile.mkdtemp(prefix="sarvam_stt_"))
     try:
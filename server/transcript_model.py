@@ -0,0 +1,197 @@
+from array import array
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+TIMESTAMP_KEYS = ("words", "start_time_seconds", "end_time_seconds", "words_english")
+ENTRY_KEYS = (
+    "transcript",
+    "start_time_seconds",
+    "end_time_seconds",
+    "speaker_id",
+    "transcript_english",
+    "intent_classification",
+)
+TOP_LEVEL_KEYS = (
+    "request_id",
+    "transcript",
+    "timestamps",
+    "diarized_transcript",
+    "language_code",
+    "language_probability",
+    "transcript_english",
+)
+
+
+def _float_column(values: Iterable[Any] | None) -> array | list[Any]:
+    values = list(values or [])
+    try:
+        return array("d", values)
+    except TypeError:
+        # Sarvam occasionally emits nulls; keep those columns as plain lists.
+        return values
+
+
+def _extra(data: dict[str, Any], known: tuple[str, ...]) -> dict[str, Any]:
+    return {key: value for key, value in data.items() if key not in known}
+
+
+@dataclass(slots=True)
+class TimestampColumns:
+    words: list[str]
+    start_time_seconds: array | list[Any]
+    end_time_seconds: array | list[Any]
+    words_english: list[str] | None = None
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "TimestampColumns":
+        return cls(
+            words=list(data.get("words") or []),
+            start_time_seconds=_float_column(data.get("start_time_seconds")),
+            end_time_seconds=_float_column(data.get("end_time_seconds")),
+            words_english=data.get("words_english"),
+            extra=_extra(data, TIMESTAMP_KEYS),
+        )
+
+    def to_dict(self) -> dict[str, Any]:
+        result: dict[str, Any] = {
+            "words": self.words,
+            "start_time_seconds": list(self.start_time_seconds),
+            "end_time_seconds": list(self.end_time_seconds),
+        }
+        result.update(self.extra)
+        if self.words_english is not None:
+            result["words_english"] = self.words_english
+        return result
+
+
+@dataclass(slots=True)
+class DiarizedEntry:
+    transcript: str | None
+    start_time_seconds: float | None = None
+    end_time_seconds: float | None = None
+    speaker_id: str | None = None
+    transcript_english: str | None = None
+    intent_classification: dict[str, Any] | None = None
+    extra: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "DiarizedEntry":
+        return cls(
+            transcript=data.get("transcript"),
+            start_time_seconds=data.get("start_time_seconds"),
+            end_time_seconds=data.get("end_time_seconds"),
+            speaker_id=data.get("speaker_id"),
+            transcript_english=data.get("transcript_english"),
+            intent_classification=data.get("intent_classification"),
+            extra=_extra(data, ENTRY_KEYS),
+        )
+
+    @property
+    def utterance(self) -> str | None:
+        return (
+            self.transcript_english
+            or self.extra.get("utterance")
+            or self.transcript
+        )
+
+    def to_dict(self, *, include_intents: bool = False) -> dict[str, Any]:
+        result: dict[str, Any] = {
+            "transcript": self.transcript,
+            "start_time_seconds": self.start_time_seconds,
+            "end_time_seconds": self.end_time_seconds,
+            "speaker_id": self.speaker_id,
+        }
+        result.update(self.extra)
+        if self.transcript_english is not None:
+            result["transcript_english"] = self.transcript_english
+        if include_intents and self.intent_classification is not None:
+            result["intent_classification"] = self.intent_classification
+        return result
+
+
+@dataclass(slots=True)
+class Transcript:
+    """Sarvam STT output, parsed once and annotated in place by each stage.
+
+    ``to_dict`` reproduces the JSON shape the API has always returned, so the
+    model never leaks into responses.
+    """
+
+    transcript: str | None = None
+    request_id: str | None = None
+    language_code: str | None = None
+    language_probability: float | None = None
+    transcript_english: str | None = None
+    timestamps: TimestampColumns | None = None
+    entries: list[DiarizedEntry] | None = None
+    extra: dict[str, Any] = field(default_factory=dict)
+    # Known keys the input carried as null (or in an unparseable shape),
+    # echoed back as given until a stage sets them.
+    unset: dict[str, Any] = field(default_factory=dict)
+    # Per-stage pipeline metrics; never serialized by to_dict.
+    metrics: dict[str, Any] = field(default_factory=dict)
+
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "Transcript":
+        timestamps = data.get("timestamps")
+        diarized = data.get("diarized_transcript")
+        entries = diarized.get("entries") if isinstance(diarized, dict) else None
+        transcript = cls(
+            transcript=data.get("transcript"),
+            request_id=data.get("request_id"),
+            language_code=data.get("language_code"),
+            language_probability=data.get("language_probability"),
+            transcript_english=data.get("transcript_english"),
+            timestamps=(
+                TimestampColumns.from_dict(timestamps)
+                if isinstance(timestamps, dict)
+                else None
+            ),
+            entries=(
+                [DiarizedEntry.from_dict(entry) for entry in entries]
+                if isinstance(entries, list)
+                else None
+            ),
+            extra=_extra(data, TOP_LEVEL_KEYS),
+        )
+        transcript.unset = {
+            key: data[key]
+            for key in TOP_LEVEL_KEYS
+            if key in data and transcript._field(key) is None
+        }
+        return transcript
+
+    @classmethod
+    def from_entries(cls, entries: list[dict[str, Any]]) -> "Transcript":
+        return cls(entries=[DiarizedEntry.from_dict(entry) for entry in entries])
+
+    def _field(self, key: str) -> Any:
+        if key == "diarized_transcript":
+            return self.entries
+        return getattr(self, key)
+
+    def to_dict(self, *, include_intents: bool = False) -> dict[str, Any]:
+        result: dict[str, Any] = {}
+        for key in TOP_LEVEL_KEYS:
+            if key == "transcript_english":
+                result.update(self.extra)
+            value = self._field(key)
+            if value is None:
+                if key in self.unset:
+                    result[key] = self.unset[key]
+            elif key == "timestamps":
+                result[key] = value.to_dict()
+            elif key == "diarized_transcript":
+                result[key] = {
+                    "entries": [entry.to_dict(include_intents=include_intents) for entry in value]
+                }
+            else:
+                result[key] = value
+        return result
+
+
+def as_transcript(data: "Transcript | dict[str, Any]") -> Transcript:
+    if isinstance(data, Transcript):
+        return data
+    return Transcript.from_dict(data)
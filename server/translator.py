@@ -1,15 +1,21 @@
 import json
 import os
 import re
-from copy import deepcopy
+from dataclasses import asdict, dataclass
+from functools import lru_cache
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-from dotenv import load_dotenv
-from sarvamai import SarvamAI
+from resilience import call_vendor
+from settings import load_env
+from transcript_model import Transcript, as_transcript
 
-BASE_DIR = Path(__file__).resolve().parent
-load_dotenv(BASE_DIR / ".env")
+if TYPE_CHECKING:
+    from sarvamai import SarvamAI
+
+load_env()
+
+TRANSLATE_TIMEOUT_SECONDS = float(os.getenv("TRANSLATE_TIMEOUT_SECONDS", "30"))
 
 SCRIPT_LANGUAGE_HINTS: list[tuple[str, str]] = [
     ("ta-IN", r"[\u0B80-\u0BFF]"),  # Tamil
@@ -26,15 +32,19 @@ def infer_source_language(text: str, fallback: str) -> str:
     return fallback
 
 
-def get_client() -> SarvamAI:
+@lru_cache(maxsize=1)
+def get_client() -> "SarvamAI":
+    from sarvamai import SarvamAI
+
     api_key = os.getenv("SARVAM_API_KEY")
     if not api_key:
         raise RuntimeError("SARVAM_API_KEY is not set")
-    return SarvamAI(api_subscription_key=api_key)
+    # The client's own timeout stops slow calls; call_vendor does not abandon them.
+    return SarvamAI(api_subscription_key=api_key, timeout=TRANSLATE_TIMEOUT_SECONDS)
 
 
 def translate_text(
-    client: SarvamAI,
+    client: "SarvamAI",
     text: str,
     source_lang: str,
     target_lang: str = "en-IN",
@@ -43,7 +53,12 @@ def translate_text(
         return text
 
     detected_source = infer_source_language(text, source_lang)
-    response = client.text.translate(
+    response = call_vendor(
+        "sarvam",
+        "sarvam.translate",
+        client.text.translate,
+        hedge=True,
+        timeout=TRANSLATE_TIMEOUT_SECONDS,
         input=text,
         source_language_code=detected_source,
         target_language_code=target_lang,
@@ -59,44 +74,151 @@ def translate_text(
     return str(response)
 
 
-def translate_transcription(
-    transcription_data: dict[str, Any],
+@dataclass(slots=True)
+class TranslationMetrics:
+    chars_present: int = 0
+    chars_translated: int = 0
+    calls: int = 0
+    spans: int = 0
+    unaligned_spans: int = 0
+
+
+def _needs_translation(text: str | None) -> bool:
+    return bool(text) and text != "<nospeech>"
+
+
+def locate_spans(
+    reference: str, texts: list[str | None]
+) -> list[tuple[int, int] | None]:
+    """Finds each text in reference, in order, without letting spans go backwards."""
+    located: list[tuple[int, int] | None] = []
+    cursor = 0
+    for text in texts:
+        needle = (text or "").strip()
+        position = reference.find(needle, cursor) if needle else -1
+        if position == -1:
+            located.append(None)
+            continue
+        cursor = position + len(needle)
+        located.append((position, cursor))
+    return located
+
+
+def _atomic_spans(
+    reference: str, located: list[tuple[int, int] | None]
+) -> list[tuple[int, int]]:
+    boundaries = {0, len(reference)}
+    for span in located:
+        if span is not None:
+            boundaries.update(span)
+
+    edges = sorted(boundaries)
+    atoms: list[tuple[int, int]] = []
+    for start, end in zip(edges, edges[1:]):
+        piece = reference[start:end]
+        stripped = piece.strip()
+        if stripped:
+            offset = start + piece.index(stripped)
+            atoms.append((offset, offset + len(stripped)))
+    return atoms
+
+
+def translate_transcript(
+    transcript: Transcript,
     *,
     source_lang: str | None = None,
     target_lang: str = "en-IN",
-) -> dict[str, Any]:
-    data = deepcopy(transcription_data)
-    source_language = source_lang or data.get("language_code")
+) -> Transcript:
+    """Translates transcript, timestamp words and diarized entries in place.
+
+    The three granularities carry the same text, so they are aligned against
+    the full transcript and only the finest non-overlapping spans are sent to
+    Sarvam; coarser fields are composed from those pieces. Spans that cannot
+    be aligned are translated on their own.
+    """
+    source_language = source_lang or transcript.language_code
     if not source_language:
         raise ValueError(
             "Source language not found. Expected language_code in transcription output."
         )
 
     client = get_client()
+    metrics = TranslationMetrics()
+    cache: dict[str, str] = {}
+
+    def translate(text: str) -> str:
+        if text not in cache:
+            if _needs_translation(text):
+                metrics.calls += 1
+                metrics.chars_translated += len(text)
+            cache[text] = translate_text(client, text, source_language, target_lang)
+        return cache[text]
+
+    timestamps = transcript.timestamps
+    words: list[str | None] = list(timestamps.words) if timestamps is not None else []
+    entries = transcript.entries or []
+    entry_texts = [entry.transcript for entry in entries]
+
+    present = [transcript.transcript, *words, *entry_texts]
+    metrics.chars_present = sum(len(text) for text in present if _needs_translation(text))
+
+    reference = transcript.transcript
+    if reference is None:
+        reference = " ".join(word for word in words if word) or " ".join(
+            text for text in entry_texts if text
+        )
+
+    word_spans = locate_spans(reference, words)
+    entry_spans = locate_spans(reference, entry_texts)
+    atoms = _atomic_spans(reference, word_spans + entry_spans)
+    metrics.spans = len(atoms)
+    atom_english = [translate(reference[start:end]) for start, end in atoms]
+
+    def compose(text: str | None, span: tuple[int, int] | None) -> str | None:
+        if text is None:
+            return None
+        if span is None:
+            metrics.unaligned_spans += 1
+            return translate(text)
+        start, end = span
+        pieces = [
+            english
+            for (atom_start, atom_end), english in zip(atoms, atom_english)
+            if atom_start >= start and atom_end <= end
+        ]
+        return " ".join(pieces) if pieces else text
 
-    if "transcript" in data:
-        data["transcript_english"] = translate_text(
-            client, data["transcript"], source_language, target_lang
+    if transcript.transcript is not None:
+        transcript.transcript_english = compose(
+            transcript.transcript, (0, len(reference))
         )
 
-    timestamps = data.get("timestamps")
-    words = timestamps.get("words") if isinstance(timestamps, dict) else None
-    if isinstance(words, list):
-        timestamps["words_english"] = [
-            translate_text(client, word, source_language, target_lang) for word in words
+    if timestamps is not None:
+        timestamps.words_english = [
+            compose(word, span) for word, span in zip(words, word_spans)
         ]
 
-    diarized = data.get("diarized_transcript")
-    entries = diarized.get("entries") if isinstance(diarized, dict) else None
-    if isinstance(entries, list):
-        for entry in entries:
-            transcript = entry.get("transcript")
-            if transcript is not None:
-                entry["transcript_english"] = translate_text(
-                    client, transcript, source_language, target_lang
-                )
-
-    return data
+    for entry, span in zip(entries, entry_spans):
+        if entry.transcript is not None:
+            entry.transcript_english = compose(entry.transcript, span)
+
+    transcript.metrics["translation"] = asdict(metrics)
+    print(
+        f"[translate] {metrics.chars_translated}/{metrics.chars_present} chars "
+        f"translated in {metrics.calls} calls ({metrics.unaligned_spans} unaligned spans)"
+    )
+    return transcript
+
+
+def translate_transcription(
+    transcription_data: Transcript | dict[str, Any],
+    *,
+    source_lang: str | None = None,
+    target_lang: str = "en-IN",
+) -> dict[str, Any]:
+    transcript = as_transcript(transcription_data)
+    translate_transcript(transcript, source_lang=source_lang, target_lang=target_lang)
+    return transcript.to_dict()
 
 
 def translate_transcript_file(